@@ -1,32 +1,62 @@
 from django.contrib import admin
 from django.shortcuts import reverse, redirect
-from django.templatetags.static import static
 from django.utils.html import format_html
 from django.db import transaction
+from django.db.models import Q
 from django.utils.http import url_has_allowed_host_and_scheme
-from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem, Order, OrderItem
+from star_burger.db_router import replica_reads
+from .eligibility import get_eligibility_index
+from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem, Order, OrderChange, OrderItem
+
+
+def render_picture(thumbnail, style):
+    if not thumbnail['webp']:
+        return format_html('<img src="{src}" style="{style}"/>', src=thumbnail['jpeg'], style=style)
+    return format_html(
+        '<picture><source srcset="{webp}" type="image/webp"><img src="{src}" style="{style}"/></picture>',
+        webp=thumbnail['webp'], src=thumbnail['jpeg'], style=style,
+    )
+
+
+class ReplicaChangeListMixin:
+    """Списки объектов в админке читаются с реплики, формы — с основной базы."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
     model = RestaurantMenuItem
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('restaurant', 'product')
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ['price']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Restaurant)
-class RestaurantAdmin(admin.ModelAdmin):
+class RestaurantAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     search_fields = ['name', 'address', 'contact_phone']
     list_display = ['name', 'address', 'contact_phone']
     inlines = [RestaurantMenuItemInline]
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ['get_image_list_preview', 'name', 'category', 'price']
     list_display_links = ['name']
     list_filter = ['category']
@@ -44,30 +74,30 @@ class ProductAdmin(admin.ModelAdmin):
     readonly_fields = ['get_image_preview']
 
     class Media:
-        css = {"all": (static("admin/foodcartapp.css"),)}
+        css = {"all": ("admin/foodcartapp.css",)}
 
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        return render_picture(obj.get_thumbnail(256), 'max-height: 200px;')
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>',
-                           edit_url=edit_url, src=obj.image.url)
+        return format_html('<a href="{edit_url}">{picture}</a>', edit_url=edit_url,
+                           picture=render_picture(obj.get_thumbnail(64), 'max-height: 50px;'))
     get_image_list_preview.short_description = 'превью'
 
 
 @admin.register(ProductCategory)
-class ProductCategoryAdmin(admin.ModelAdmin):
+class ProductCategoryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     pass
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = [
         'id',
         'firstname',
@@ -83,6 +113,7 @@ class OrderAdmin(admin.ModelAdmin):
         'payment_method',
         'get_payment_method_display',
         'restaurant',
+        'total_price',
     ]
     list_filter = ['status', 'created_at', 'called_at', 'delivered_at', 'payment_method', 'restaurant']
     search_fields = ['id', 'firstname', 'lastname', 'phonenumber', 'address', 'comment']
@@ -98,13 +129,30 @@ class OrderAdmin(admin.ModelAdmin):
         'restaurant',
         'called_at',
         'delivered_at',
+        'total_price',
     ]
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'total_price']
 
     def save_model(self, request, obj, form, change):
         if obj.restaurant and obj.status == 'UNPROCESSED':
             obj.status = 'NEW'
-        super().save_model(request, obj, form, change)
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            OrderChange.objects.record(
+                [obj.pk], OrderChange.UPDATED if change else OrderChange.CREATED
+            )
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            order_id = obj.pk
+            super().delete_model(request, obj)
+            OrderChange.objects.record([order_id], OrderChange.DELETED)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            order_ids = list(queryset.values_list('pk', flat=True))
+            super().delete_queryset(request, queryset)
+            OrderChange.objects.record(order_ids, OrderChange.DELETED)
 
     def save_formset(self, request, form, formset, change):
         with transaction.atomic():
@@ -116,6 +164,8 @@ class OrderAdmin(admin.ModelAdmin):
             for obj in formset.deleted_objects:
                 obj.delete()
             formset.save_m2m()
+            if formset.model is OrderItem:
+                Order.objects.filter(pk=form.instance.pk).recalculate_total_price()
 
     def response_change(self, request, obj):
         next_url = request.GET.get('next')
@@ -128,15 +178,39 @@ class OrderAdmin(admin.ModelAdmin):
         return super().response_change(request, obj)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        if db_field.name == 'restaurant' and request.resolver_match.args:
-            order_id = request.resolver_match.args[0]
-            order = Order.objects.get(pk=order_id)
-            available_restaurants = getattr(order, 'available_restaurants', [])
-            kwargs['queryset'] = Restaurant.objects.filter(pk__in=[r.id for r in available_restaurants])
+        object_id = request.resolver_match.kwargs.get('object_id')
+        if db_field.name == 'restaurant' and object_id:
+            product_ids = set(
+                OrderItem.objects.filter(order_id=object_id).values_list('product_id', flat=True)
+            )
+            available_restaurants = get_eligibility_index().find_restaurants(product_ids)
+            kwargs['queryset'] = Restaurant.objects.filter(
+                Q(pk__in=[restaurant.id for restaurant in available_restaurants])
+                | Q(restaurant_orders__pk=object_id)
+            ).distinct()
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
-    search_fields = ('order__id', 'product__name')
\ No newline at end of file
+    search_fields = ('order__id', 'product__name')
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            Order.objects.filter(pk=obj.order_id).recalculate_total_price()
+            OrderChange.objects.record([obj.order_id], OrderChange.UPDATED)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            Order.objects.filter(pk=obj.order_id).recalculate_total_price()
+            OrderChange.objects.record([obj.order_id], OrderChange.UPDATED)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            order_ids = set(queryset.values_list('order_id', flat=True))
+            super().delete_queryset(request, queryset)
+            Order.objects.filter(pk__in=order_ids).recalculate_total_price()
+            OrderChange.objects.record(order_ids, OrderChange.UPDATED)
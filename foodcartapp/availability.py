@@ -0,0 +1,56 @@
+from django.db.models import F
+
+from star_burger.db_router import primary_reads
+
+from .versions import MENU_VERSION_KEY, get_version
+
+_matrix = None
+_matrix_version = None
+
+
+class AvailabilityMatrix:
+    """Матрица «продукт в продаже в ресторане» для страницы меню менеджера.
+
+    Столбцы — рестораны по алфавиту, строка продукта — целое число,
+    в котором бит i выставлен, если продукт продаётся в i-м ресторане.
+    Продукты без единого ресторана в матрицу не попадают.
+    """
+
+    def __init__(self, restaurants, menu):
+        self.restaurants = list(restaurants)
+        positions = {restaurant.id: position for position, restaurant in enumerate(self.restaurants)}
+        self.rows = {}
+        for restaurant_id, product_ids in menu:
+            bit = 1 << positions[restaurant_id]
+            for product_id in product_ids:
+                self.rows[product_id] = self.rows.get(product_id, 0) | bit
+
+    @classmethod
+    def from_db(cls):
+        """Собирает матрицу одним запросом: меню ресторанов уже свёрнуты в RestaurantCapability."""
+        from .models import Restaurant
+
+        restaurants = list(
+            Restaurant.objects.order_by("name", "id")
+            .only("id", "name")
+            .annotate(product_ids=F("capability__product_ids"))
+        )
+        return cls(
+            restaurants,
+            [(restaurant.id, restaurant.product_ids or []) for restaurant in restaurants],
+        )
+
+    def get_cells(self, product_id, start, stop):
+        """Доступность продукта в ресторанах с позициями [start, stop)."""
+        mask = self.rows.get(product_id, 0) >> start
+        return [bool(mask >> position & 1) for position in range(stop - start)]
+
+
+def get_availability_matrix():
+    global _matrix, _matrix_version
+    version = get_version(MENU_VERSION_KEY)
+    if _matrix is None or version is None or _matrix_version != version:
+        with primary_reads():
+            _matrix = AvailabilityMatrix.from_db()
+        _matrix_version = version
+    return _matrix
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Restaurant, RestaurantCapability, RestaurantMenuItem
+from .versions import MENU_VERSION_KEY, bump_version
+
+
+def change_capability(restaurant_id, added=(), removed=()):
+    """Точечно меняет набор продуктов ресторана и поднимает версию записи."""
+    with transaction.atomic():
+        capability = (
+            RestaurantCapability.objects.select_for_update()
+            .filter(restaurant_id=restaurant_id)
+            .first()
+        )
+        if capability is None:
+            if not added:
+                return
+            capability, _ = RestaurantCapability.objects.select_for_update().get_or_create(
+                restaurant_id=restaurant_id
+            )
+        product_ids = set(capability.product_ids)
+        product_ids.difference_update(removed)
+        product_ids.update(added)
+        capability.product_ids = sorted(product_ids)
+        capability.version += 1
+        capability.save(update_fields=["product_ids", "version"])
+
+
+def touch_capability(restaurant_id):
+    RestaurantCapability.objects.filter(restaurant_id=restaurant_id).update(
+        version=F("version") + 1
+    )
+
+
+def rebuild_capabilities(restaurant_ids=None):
+    """Пересобирает записи по меню целиком — для массовых операций в обход сигналов."""
+    restaurants = Restaurant.objects.all()
+    if restaurant_ids is not None:
+        restaurants = restaurants.filter(pk__in=restaurant_ids)
+    restaurant_ids = list(restaurants.values_list("pk", flat=True))
+    product_ids = {restaurant_id: [] for restaurant_id in restaurant_ids}
+    menu = RestaurantMenuItem.objects.filter(
+        restaurant_id__in=restaurant_ids, availability=True
+    ).values_list("restaurant_id", "product_id").order_by("restaurant_id", "product_id")
+    for restaurant_id, product_id in menu:
+        product_ids[restaurant_id].append(product_id)
+
+    with transaction.atomic():
+        versions = dict(
+            RestaurantCapability.objects.filter(restaurant_id__in=restaurant_ids).values_list(
+                "restaurant_id", "version"
+            )
+        )
+        RestaurantCapability.objects.bulk_create(
+            [
+                RestaurantCapability(
+                    restaurant_id=restaurant_id,
+                    product_ids=products,
+                    version=versions.get(restaurant_id, 0) + 1,
+                )
+                for restaurant_id, products in product_ids.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["restaurant"],
+            update_fields=["product_ids", "version"],
+            batch_size=500,
+        )
+    bump_version(MENU_VERSION_KEY)
+    return len(product_ids)
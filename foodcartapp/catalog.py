@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product, RestaurantMenuItem
+from .versions import CATALOG_VERSION_KEY, get_version
+
+CATALOG_KEY = "foodcartapp:catalog:{version}"
+
+_snapshot_version = None
+_snapshot = None
+
+
+def get_srcset(product):
+    variants = product.get_image_variants()
+    if not variants:
+        return None
+    return {
+        extension: ", ".join(f"{variant[extension]} {variant['width']}w" for variant in variants)
+        for extension in ("webp", "jpeg")
+    }
+
+
+def serialize_catalog():
+    available_menu_items = Prefetch(
+        "menu_items",
+        queryset=RestaurantMenuItem.objects.filter(availability=True).select_related(
+            "restaurant"
+        ),
+        to_attr="available_menu_items",
+    )
+    products = (
+        Product.objects.select_related("category")
+        .available()
+        .prefetch_related(available_menu_items)
+    )
+    return [
+        {
+            "id": product.id,
+            "name": product.name,
+            "price": product.price,
+            "special_status": product.special_status,
+            "description": product.description,
+            "category": {
+                "id": product.category.id,
+                "name": product.category.name,
+            } if product.category else None,
+            "image": product.image.url,
+            "image_variants": [
+                {
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "webp": variant["webp"],
+                    "jpeg": variant["jpeg"],
+                } for variant in product.get_image_variants()
+            ],
+            "image_srcset": get_srcset(product),
+            "restaurants": [
+                {
+                    "id": menu_item.restaurant.id,
+                    "name": menu_item.restaurant.name,
+                } for menu_item in product.available_menu_items
+            ],
+        } for product in products
+    ]
+
+
+def get_catalog_snapshot():
+    global _snapshot_version, _snapshot
+    version = get_version(CATALOG_VERSION_KEY)
+    if version is None:
+        # Кэш недоступен (или это DummyCache): версии не узнать, собираем каталог заново.
+        return JSONRenderer().render(serialize_catalog())
+    if _snapshot_version == version:
+        return _snapshot
+
+    key = CATALOG_KEY.format(version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = JSONRenderer().render(serialize_catalog())
+        cache.set(key, snapshot, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    _snapshot_version, _snapshot = version, snapshot
+    return snapshot
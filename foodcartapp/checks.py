@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f"Кэш {backend} не виден другим процессам: смена версии каталога, меню "
+            "или адресов в одном процессе не дойдёт до остальных.",
+            hint="Укажите CACHE_BACKEND и CACHE_LOCATION общего кэша: Redis, Memcached "
+                 "или django.core.cache.backends.db.DatabaseCache.",
+            id="foodcartapp.E001",
+        )
+    ]
@@ -0,0 +1,207 @@
+import copy
+
+from star_burger.db_router import primary_reads
+
+from .versions import MENU_VERSION_KEY, get_version
+
+_index = None
+_index_version = None
+
+
+class RestaurantEligibilityIndex:
+    """Индекс «какие рестораны могут приготовить набор продуктов».
+
+    Каждому ресторану соответствует бит, каждому продукту — целое число,
+    в котором выставлены биты ресторанов, где продукт есть в продаже.
+    Рестораны для заказа — побитовое AND масок его продуктов, маска
+    раскладывается в список ресторанов побайтно по заранее собранным таблицам.
+    Индекс обновляется по одному ресторану: меняются только его биты
+    и таблица его байта. Меняется всегда копия — см. refresh.
+    """
+
+    def __init__(self, restaurants, menu):
+        self.restaurants = sorted(restaurants, key=lambda restaurant: restaurant.id)
+        self._positions = {
+            restaurant.id: position for position, restaurant in enumerate(self.restaurants)
+        }
+        self.restaurant_products = {restaurant.id: set() for restaurant in self.restaurants}
+        self.product_masks = {}
+        for restaurant_id, product_id in menu:
+            position = self._positions.get(restaurant_id)
+            if position is None:
+                continue
+            self.restaurant_products[restaurant_id].add(product_id)
+            self.product_masks[product_id] = self.product_masks.get(product_id, 0) | 1 << position
+        self.versions = {}
+        self._chunks = []
+        self._update_layout()
+
+    @classmethod
+    def from_db(cls):
+        from .models import RestaurantCapability
+
+        capabilities = list(
+            RestaurantCapability.objects.exclude(product_ids=[]).select_related("restaurant")
+        )
+        index = cls(
+            [capability.restaurant for capability in capabilities],
+            [
+                (capability.restaurant_id, product_id)
+                for capability in capabilities
+                for product_id in capability.product_ids
+            ],
+        )
+        index.versions = {
+            capability.restaurant_id: capability.version for capability in capabilities
+        }
+        return index
+
+    def refresh(self):
+        """Новый индекс с записями тех ресторанов, у которых сменилась версия.
+
+        Текущий индекс не меняется: его в это время читают другие потоки.
+        Позиции удалённых ресторанов в новом индексе уплотняются.
+        """
+        from .models import RestaurantCapability
+
+        index = self.copy()
+        seen = set()
+        for capability in RestaurantCapability.objects.select_related("restaurant"):
+            seen.add(capability.restaurant_id)
+            if index.versions.get(capability.restaurant_id) == capability.version:
+                continue
+            index.update_restaurant(capability.restaurant, capability.product_ids)
+            index.versions[capability.restaurant_id] = capability.version
+        for restaurant_id in set(index.versions) - seen:
+            index.remove_restaurant(restaurant_id)
+        if None in index.restaurants:
+            index = index.compact()
+        return index
+
+    def copy(self):
+        """Копия, которую можно менять, не трогая исходный индекс.
+
+        Множества продуктов и таблицы байтов не копируются: обновление
+        заменяет их целиком, а не меняет на месте.
+        """
+        index = copy.copy(self)
+        index.restaurants = list(self.restaurants)
+        index._positions = dict(self._positions)
+        index.restaurant_products = dict(self.restaurant_products)
+        index.product_masks = dict(self.product_masks)
+        index.versions = dict(self.versions)
+        index._chunks = list(self._chunks)
+        index._decoded = {0: []}
+        return index
+
+    def compact(self):
+        """Новый индекс без пустых позиций, оставшихся от удалённых ресторанов."""
+        index = type(self)(
+            [restaurant for restaurant in self.restaurants if restaurant is not None],
+            [
+                (restaurant_id, product_id)
+                for restaurant_id, product_ids in self.restaurant_products.items()
+                for product_id in product_ids
+            ],
+        )
+        index.versions = dict(self.versions)
+        return index
+
+    def update_restaurant(self, restaurant, product_ids):
+        if not product_ids:
+            self.remove_restaurant(restaurant.id)
+            return
+        position = self._positions.get(restaurant.id)
+        if position is None:
+            position = len(self.restaurants)
+            self._positions[restaurant.id] = position
+            self.restaurants.append(restaurant)
+        else:
+            self.restaurants[position] = restaurant
+        bit = 1 << position
+        previous = self.restaurant_products.get(restaurant.id, set())
+        current = set(product_ids)
+        for product_id in previous - current:
+            self._clear_bit(product_id, bit)
+        for product_id in current - previous:
+            self.product_masks[product_id] = self.product_masks.get(product_id, 0) | bit
+        self.restaurant_products[restaurant.id] = current
+        self._update_layout(position)
+
+    def remove_restaurant(self, restaurant_id):
+        self.versions.pop(restaurant_id, None)
+        position = self._positions.pop(restaurant_id, None)
+        if position is None:
+            return
+        bit = 1 << position
+        for product_id in self.restaurant_products.pop(restaurant_id):
+            self._clear_bit(product_id, bit)
+        self.restaurants[position] = None
+        self._update_layout(position)
+
+    def _clear_bit(self, product_id, bit):
+        mask = self.product_masks.get(product_id, 0) & ~bit
+        if mask:
+            self.product_masks[product_id] = mask
+        else:
+            self.product_masks.pop(product_id, None)
+
+    def _update_layout(self, position=None):
+        self.full_mask = (1 << len(self.restaurants)) - 1
+        self._mask_bytes = (len(self.restaurants) + 7) // 8
+        starts = range(len(self._chunks) * 8, len(self.restaurants), 8)
+        if position is not None and position // 8 < len(self._chunks):
+            self._chunks[position // 8] = self._build_chunk(position // 8 * 8)
+        self._chunks.extend(self._build_chunk(start) for start in starts)
+        self._decoded = {0: []}
+
+    def _build_chunk(self, start):
+        chunk = self.restaurants[start:start + 8]
+        return [
+            tuple(
+                chunk[position]
+                for position in range(len(chunk))
+                if byte >> position & 1 and chunk[position] is not None
+            )
+            for byte in range(256)
+        ]
+
+    def get_mask(self, product_ids):
+        mask = self.full_mask
+        for product_id in product_ids:
+            mask &= self.product_masks.get(product_id, 0)
+            if not mask:
+                return 0
+        return mask
+
+    def decode(self, mask):
+        restaurants = self._decoded.get(mask)
+        if restaurants is None:
+            restaurants = []
+            for chunk, byte in enumerate(mask.to_bytes(self._mask_bytes, "little")):
+                if byte:
+                    restaurants.extend(self._chunks[chunk][byte])
+            self._decoded[mask] = restaurants
+        return restaurants
+
+    def find_restaurants(self, product_ids):
+        return list(self.decode(self.get_mask(product_ids)))
+
+
+def get_eligibility_index():
+    global _index, _index_version
+    version = get_version(MENU_VERSION_KEY)
+    with primary_reads():
+        if _index is None or version is None:
+            _index = RestaurantEligibilityIndex.from_db()
+        elif _index_version != version:
+            _index = _index.refresh()
+    _index_version = version
+    return _index
+
+
+def attach_available_restaurants(orders):
+    index = get_eligibility_index()
+    for order in orders:
+        order_products = {item.product_id for item in order.items.all()}
+        setattr(order, "available_restaurants", index.find_restaurants(order_products))
@@ -0,0 +1,156 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Order, OrderItem
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+ORDER_COLUMNS = [
+    "id", "status", "payment_method", "created_at", "called_at", "delivered_at",
+    "firstname", "lastname", "phonenumber", "address", "comment",
+    "restaurant_id", "restaurant", "total_price",
+]
+ITEM_COLUMNS = ["product_id", "product", "quantity", "price"]
+
+
+def parse_export_filters(params):
+    """Проверяет фильтры выгрузки: date_from, date_to, status, payment_method, restaurant."""
+    filters = {}
+    for name in ("date_from", "date_to"):
+        value = params.get(name) or ""
+        if not value:
+            continue
+        try:
+            date = parse_date(value)
+        except ValueError:
+            date = None
+        if date is None:
+            raise ValueError(f"{name}: ожидается дата в формате ГГГГ-ММ-ДД, получено {value!r}")
+        filters[name] = date
+    status = params.get("status") or ""
+    if status:
+        if status not in dict(Order.STATUS_CHOICES):
+            raise ValueError(f"status: неизвестный статус {status!r}")
+        filters["status"] = status
+    payment_method = params.get("payment_method") or ""
+    if payment_method:
+        if payment_method not in dict(Order.PAYMENT_METHOD_CHOICES):
+            raise ValueError(f"payment_method: неизвестный способ оплаты {payment_method!r}")
+        filters["payment_method"] = payment_method
+    restaurant = params.get("restaurant") or ""
+    if restaurant:
+        if restaurant != "none" and not restaurant.isdigit():
+            raise ValueError(f"restaurant: ожидается id ресторана или none, получено {restaurant!r}")
+        filters["restaurant"] = restaurant
+    return filters
+
+
+def get_export_orders(filters):
+    """Те же заказы, что на странице заказов менеджера, плюс фильтр по датам."""
+    orders = (
+        Order.objects.filter_for_manager(
+            filters.get("status", ""),
+            filters.get("payment_method", ""),
+            filters.get("restaurant", ""),
+        )
+        .select_related("restaurant")
+        .order_by("id")
+    )
+    current_timezone = timezone.get_current_timezone()
+    if "date_from" in filters:
+        start = datetime.combine(filters["date_from"], time.min, tzinfo=current_timezone)
+        orders = orders.filter(created_at__gte=start)
+    if "date_to" in filters:
+        end = datetime.combine(
+            filters["date_to"] + timedelta(days=1), time.min, tzinfo=current_timezone
+        )
+        orders = orders.filter(created_at__lt=end)
+    return orders
+
+
+def localtime(value):
+    return timezone.localtime(value) if value else None
+
+
+def iter_export_orders(orders, chunk_size):
+    """Заказы с позициями: позиции подгружаются одним запросом на каждую пачку заказов."""
+    items = Prefetch(
+        "items",
+        queryset=OrderItem.objects.select_related("product").only(
+            "order_id", "product_id", "product__name", "quantity", "price"
+        ),
+    )
+    for order in orders.prefetch_related(items).iterator(chunk_size=chunk_size):
+        yield {
+            "id": order.id,
+            "status": order.status,
+            "payment_method": order.payment_method,
+            "created_at": localtime(order.created_at),
+            "called_at": localtime(order.called_at),
+            "delivered_at": localtime(order.delivered_at),
+            "firstname": order.firstname,
+            "lastname": order.lastname,
+            "phonenumber": str(order.phonenumber),
+            "address": order.address,
+            "comment": order.comment,
+            "restaurant_id": order.restaurant_id,
+            "restaurant": order.restaurant.name if order.restaurant else None,
+            "total_price": order.total_price,
+            "items": [
+                {
+                    "product_id": item.product_id,
+                    "product": item.product.name,
+                    "quantity": item.quantity,
+                    "price": item.price,
+                }
+                for item in order.items.all()
+            ],
+        }
+
+
+class LineBuffer:
+    """Псевдофайл для csv.writer: write возвращает строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def render_csv(orders):
+    """Строка на каждую позицию заказа, заказ без позиций — одна строка с пустыми полями позиции."""
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    for order in orders:
+        order_row = [format_value(order[column]) for column in ORDER_COLUMNS]
+        for item in order["items"] or [dict.fromkeys(ITEM_COLUMNS)]:
+            yield writer.writerow(order_row + [format_value(item[column]) for column in ITEM_COLUMNS])
+
+
+def render_jsonl(orders):
+    for order in orders:
+        yield json.dumps(order, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def render_export(orders, export_format, batch_size=500):
+    """Строки выгрузки, склеенные пачками по batch_size, чтобы не писать по строке за раз."""
+    renderers = {"csv": render_csv, "jsonl": render_jsonl}
+    lines = renderers[export_format](orders)
+    while batch := "".join(islice(lines, batch_size)):
+        yield batch
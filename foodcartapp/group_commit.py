@@ -0,0 +1,144 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from places.utils import enqueue_geocoding
+
+from .serializers import bulk_create_orders
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class GroupCommitWriter:
+    """Пишет заказы пачками из фонового потока.
+
+    Запросы кладут провалидированные данные в очередь и ждут Future с заказом.
+    Поток собирает очередь, пока не наберётся max_batch_size заказов или не
+    пройдёт max_delay секунд с первого из них, и сохраняет пачку одной
+    транзакцией — один коммит вместо коммита на каждый заказ. Адреса пачки
+    ставятся в очередь геокодирования тоже одной вставкой.
+    """
+
+    def __init__(self, max_batch_size, max_delay, max_wait=None):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, order_data, prices, idempotency_key=None):
+        """Ставит заказ в очередь; позиции ссылаются на продукты по id, как в bulk_create_orders."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((order_data, prices, idempotency_key, future))
+        return future
+
+    def write(self, order_data, prices, idempotency_key=None, timeout=None):
+        """Записывает заказ через очередь и возвращает его.
+
+        Если за timeout заказ не записан и всё ещё ждёт в очереди, он снимается
+        с очереди и поднимается TimeoutError. Если его пачка уже пишется, запрос
+        ждёт её ещё до max_wait секунд и тоже поднимает TimeoutError. Ключ
+        идемпотентности при этом не достанется повтору: пачка держит его бронь
+        до конца своей транзакции, см. claim_keys.
+        """
+        future = self.submit(order_data, prices, idempotency_key)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            logger.warning(
+                f"Пачка с заказом пишется дольше {timeout} с, ждём ещё до {self.max_wait} с"
+            )
+            return future.result(timeout=self.max_wait)
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with _writer_lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="order-group-commit", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        # Заказы, которые сняты с очереди по таймауту, не пишутся; остальные
+        # после этого снять уже нельзя.
+        batch = [item for item in batch if item[-1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        close_old_connections()
+        prices = {}
+        for _, order_prices, _, _ in batch:
+            prices.update(order_prices)
+        try:
+            orders = bulk_create_orders(
+                [order_data for order_data, _, _, _ in batch],
+                prices,
+                [idempotency_key for _, _, idempotency_key, _ in batch],
+            )
+        except Exception:
+            logger.exception(f"Не удалось записать пачку из {len(batch)} заказов, пишем по одному")
+            for order_data, order_prices, idempotency_key, future in batch:
+                self._write_one(order_data, order_prices, idempotency_key, future)
+            return
+        for (_, _, _, future), order in zip(batch, orders):
+            future.set_result(order)
+        self._enqueue_geocoding(orders)
+
+    def _enqueue_geocoding(self, orders):
+        try:
+            enqueue_geocoding(order.address for order in orders)
+        except Exception:
+            logger.exception("Не удалось поставить адреса пачки заказов в очередь геокодирования")
+
+    def _write_one(self, order_data, prices, idempotency_key, future):
+        close_old_connections()
+        try:
+            [order] = bulk_create_orders([order_data], prices, [idempotency_key])
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(order)
+            self._enqueue_geocoding([order])
+
+
+def get_order_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(
+                    settings.ORDER_GROUP_COMMIT_BATCH_SIZE,
+                    settings.ORDER_GROUP_COMMIT_MAX_DELAY_MS / 1000,
+                    settings.IDEMPOTENCY_LEASE_SECONDS,
+                )
+    return _writer
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+class StoredResponse:
+    def __init__(self, request_hash, status_code, data, created_at):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.data = data
+        self.created_at = created_at
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+_responses = LRUCache(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+def get_ttl():
+    return timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def hash_request(data):
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get_lease():
+    return timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+
+
+def get_stored_response(key):
+    """Готовый ответ по ключу: сначала из LRU процесса, потом из таблицы.
+
+    Если заказ записан, а ответ сохранить не успели, ответ собирается по заказу.
+    """
+    stored = _responses.get(key)
+    if stored is None:
+        record = (
+            IdempotencyKey.objects.filter(key=key)
+            .filter(Q(status_code__isnull=False) | Q(order__isnull=False))
+            .select_related("order")
+            .first()
+        )
+        if record is None:
+            return None
+        if record.status_code is None:
+            from .serializers import OrderSerializer
+
+            status_code = 201
+            data = json.loads(json.dumps(OrderSerializer(record.order).data, cls=DjangoJSONEncoder))
+        else:
+            status_code, data = record.status_code, record.response
+        stored = StoredResponse(record.request_hash, status_code, data, record.created_at)
+        _responses.set(key, stored)
+    if stored.created_at < timezone.now() - get_ttl():
+        _responses.delete(key)
+        return None
+    return stored
+
+
+def reserve_key(key, request_hash):
+    """Занимает ключ до записи заказа, чтобы параллельный повтор не создал дубль.
+
+    Возвращает False, если ключ уже занят неистёкшей записью. Бронь без
+    заказа и ответа старше IDEMPOTENCY_LEASE_SECONDS считается брошенной —
+    процесс упал посреди запроса, — и её можно занять заново.
+    """
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=key, request_hash=request_hash)
+    except IntegrityError:
+        now = timezone.now()
+        expired = IdempotencyKey.objects.filter(
+            Q(created_at__lt=now - get_ttl())
+            | Q(status_code__isnull=True, order__isnull=True, created_at__lt=now - get_lease()),
+            key=key,
+        ).delete()[0]
+        if not expired:
+            return False
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(key=key, request_hash=request_hash)
+        except IntegrityError:
+            return False
+    return True
+
+
+def claim_keys(keys):
+    """Продлевает брони ключей в начале транзакции, которая пишет их заказы.
+
+    Продлённые строки заблокированы до конца транзакции: пока заказы пишутся,
+    reserve_key не сочтёт бронь брошенной, а release_key её не удалит, даже
+    если запрос уже перестал ждать запись. Если брони нет, ключ мог занять
+    повтор, и заказ не пишется.
+    """
+    keys = {key for key in keys if key is not None}
+    if not keys:
+        return
+    claimed = IdempotencyKey.objects.filter(
+        key__in=keys, status_code__isnull=True, order__isnull=True
+    ).update(created_at=timezone.now())
+    if claimed != len(keys):
+        raise ValueError("Бронь ключа идемпотентности снята или истекла, заказ не записан")
+
+
+def link_orders(keys, orders):
+    """Привязывает заказы к ключам; вызывается в транзакции, которая пишет заказы.
+
+    Тогда после коммита заказ и ключ видны вместе, и повтор запроса получит
+    этот заказ, даже если процесс упадёт до store_response.
+    """
+    for key, order in zip(keys, orders):
+        if key is not None:
+            IdempotencyKey.objects.filter(key=key).update(order=order)
+
+
+def store_response(key, request_hash, status_code, data, order_id=None):
+    data = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+    IdempotencyKey.objects.filter(key=key).update(
+        status_code=status_code, response=data, order_id=order_id
+    )
+    _responses.set(key, StoredResponse(request_hash, status_code, data, timezone.now()))
+
+
+def release_key(key):
+    """Освобождает бронь, по которой заказ не создан.
+
+    Бронь, которую держит ещё не закончившаяся запись заказа (claim_keys),
+    не трогается и не ждётся: её судьбу решит эта запись.
+    """
+    with transaction.atomic():
+        released = list(
+            IdempotencyKey.objects.select_for_update(skip_locked=True)
+            .filter(key=key, status_code__isnull=True, order__isnull=True)
+            .values_list("pk", flat=True)
+        )
+        IdempotencyKey.objects.filter(pk__in=released).delete()
+
+
+def clear_expired_keys():
+    return IdempotencyKey.objects.filter(created_at__lt=timezone.now() - get_ttl()).delete()[0]
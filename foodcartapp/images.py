@@ -0,0 +1,94 @@
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .versions import CATALOG_VERSION_KEY, bump_version
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+}
+
+
+def get_derivative_name(source_name, size, extension):
+    stem = os.path.splitext(source_name)[0]
+    return f"{DERIVATIVES_DIR}/{stem}-{size}.{extension}"
+
+
+def encode_image(image, extension):
+    options = dict(FORMATS[extension])
+    if extension == "jpeg" or "A" not in image.getbands():
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def generate_derivatives(image_field, sizes=None):
+    """Сохраняет уменьшенные копии картинки в WebP и JPEG.
+
+    Размер — граница по большей стороне, картинки не увеличиваются:
+    если исходник меньше размера, копия этого размера не создаётся.
+    Возвращает описание копий для Product.image_derivatives.
+    """
+    storage = image_field.storage
+    with image_field.open("rb") as image_file:
+        source = Image.open(image_file)
+        source = ImageOps.exif_transpose(source)
+        source.load()
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+
+    variants = []
+    previous_dimensions = None
+    for size in sorted(sizes or settings.PRODUCT_IMAGE_SIZES):
+        image = source.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        if image.size == previous_dimensions:
+            break
+        previous_dimensions = image.size
+        variant = {"size": size, "width": image.width, "height": image.height}
+        for extension in FORMATS:
+            name = get_derivative_name(image_field.name, size, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            variant[extension] = storage.save(name, ContentFile(encode_image(image, extension)))
+        variants.append(variant)
+    return {"source": image_field.name, "variants": variants}
+
+
+def update_product_images(product, force=False):
+    """Пересоздаёт копии картинки продукта, если исходник сменился.
+
+    Возвращает True, если копии пересозданы.
+    """
+    from .models import Product
+
+    if not product.image:
+        return False
+    if not force and product.image_derivatives.get("source") == product.image.name:
+        return False
+    try:
+        derivatives = generate_derivatives(product.image)
+    except OSError:
+        logger.warning(f"Не удалось обработать картинку {product.image.name} продукта {product.pk}")
+        return False
+    current_names = {
+        variant[extension] for variant in derivatives["variants"] for extension in FORMATS
+    }
+    for variant in product.image_derivatives.get("variants", []):
+        for extension in FORMATS:
+            if variant[extension] not in current_names:
+                product.image.storage.delete(variant[extension])
+    product.image_derivatives = derivatives
+    Product.objects.filter(pk=product.pk).update(image_derivatives=derivatives)
+    bump_version(CATALOG_VERSION_KEY)
+    return True
@@ -0,0 +1,86 @@
+from django.conf import settings
+
+from places.spatial import GridIndex
+from places.utils import get_places
+from star_burger.db_router import primary_reads
+
+from .versions import LOCATIONS_VERSION_KEY, get_version
+
+# До скольких ресторанов в restaurant_ids расстояния считаются перебором, а не по сетке.
+BRUTE_FORCE_LIMIT = 64
+
+_locator = None
+_locator_version = None
+
+
+class RestaurantLocator:
+    def __init__(self, restaurants, place_coords):
+        self.restaurants = {restaurant.id: restaurant for restaurant in restaurants}
+        self.coords = {}
+        self.unlocated = []
+        for restaurant in self.restaurants.values():
+            coords = place_coords.get(restaurant.address)
+            if coords and None not in coords:
+                self.coords[restaurant.id] = coords
+            else:
+                self.unlocated.append(restaurant)
+        self.index = GridIndex(
+            [(restaurant_id, lat, lon) for restaurant_id, (lat, lon) in self.coords.items()],
+            cell_size_km=settings.RESTAURANT_GRID_CELL_KM,
+        )
+
+    @classmethod
+    def from_db(cls):
+        from .models import Restaurant
+
+        restaurants = list(Restaurant.objects.all())
+        places = get_places({restaurant.address for restaurant in restaurants})
+        place_coords = {
+            address: (place.latitude, place.longitude) for address, place in places.items()
+        }
+        return cls(restaurants, place_coords)
+
+    def has_located_unlocated(self):
+        """Появились ли координаты у ресторанов, которые при сборке были без них.
+
+        Координаты находит воркер геокодирования в другом процессе, и смена
+        версии LOCATIONS может быть не видна, если кэш у процессов свой.
+        """
+        if not self.unlocated:
+            return False
+        places = get_places({restaurant.address for restaurant in self.unlocated})
+        return any(place.latitude is not None for place in places.values())
+
+    def nearest(self, coords, k=1, restaurant_ids=None):
+        """k ближайших ресторанов как список (ресторан, расстояние в метрах).
+
+        Немногие restaurant_ids перебираются напрямую: по сетке поиск среди
+        них обошёл бы все ячейки, прежде чем набрать k ресторанов.
+        """
+        lat, lon = coords
+        if restaurant_ids is None:
+            found = self.index.nearest(lat, lon, k)
+        else:
+            restaurant_ids = set(restaurant_ids)
+            if not restaurant_ids:
+                return []
+            if len(restaurant_ids) <= max(k, BRUTE_FORCE_LIMIT):
+                found = self.index.nearest_among(lat, lon, restaurant_ids, k)
+            else:
+                found = self.index.nearest(lat, lon, k, restaurant_ids.__contains__)
+        return [(self.restaurants[restaurant_id], distance) for distance, restaurant_id in found]
+
+
+def get_restaurant_locator():
+    global _locator, _locator_version
+    version = get_version(LOCATIONS_VERSION_KEY)
+    with primary_reads():
+        if (
+            _locator is None
+            or version is None
+            or _locator_version != version
+            or _locator.has_located_unlocated()
+        ):
+            _locator = RestaurantLocator.from_db()
+            _locator_version = version
+    return _locator
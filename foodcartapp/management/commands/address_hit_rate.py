@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order, Restaurant
+from places.normalization import normalize_address
+
+
+def count_hits(addresses, make_key):
+    seen = set()
+    hits = 0
+    for address in addresses:
+        key = make_key(address)
+        if key in seen:
+            hits += 1
+        seen.add(key)
+    return hits, len(seen)
+
+
+class Command(BaseCommand):
+    help = "Сравнивает долю попаданий в кэш мест по сырым и нормализованным адресам"
+
+    def handle(self, *args, **options):
+        addresses = list(Restaurant.objects.order_by("id").values_list("address", flat=True))
+        addresses += Order.objects.order_by("id").values_list("address", flat=True)
+        if not addresses:
+            self.stdout.write("Нет адресов для анализа")
+            return
+
+        raw_hits, raw_keys = count_hits(addresses, lambda address: address)
+        normalized_hits, normalized_keys = count_hits(addresses, normalize_address)
+
+        self.stdout.write(f"Адресов в истории: {len(addresses)}")
+        self.stdout.write(
+            f"Сырые адреса: {raw_keys} уникальных, "
+            f"попаданий {raw_hits / len(addresses):.1%}"
+        )
+        self.stdout.write(
+            f"Нормализованные адреса: {normalized_keys} уникальных, "
+            f"попаданий {normalized_hits / len(addresses):.1%}"
+        )
+        self.stdout.write(f"Сэкономлено запросов к геокодеру: {raw_keys - normalized_keys}")
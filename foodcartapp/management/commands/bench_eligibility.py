@@ -0,0 +1,78 @@
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.eligibility import RestaurantEligibilityIndex
+from foodcartapp.models import Restaurant
+
+
+def find_restaurants_naive(menu, restaurants_by_id, orders):
+    rests_with_products = defaultdict(set)
+    for restaurant_id, product_id in menu:
+        rests_with_products[restaurants_by_id[restaurant_id]].add(product_id)
+    return [
+        [
+            rest
+            for rest, rest_products in rests_with_products.items()
+            if order_products.issubset(rest_products)
+        ]
+        for order_products in orders
+    ]
+
+
+def find_restaurants_indexed(menu, restaurants, orders):
+    index = RestaurantEligibilityIndex(restaurants, menu)
+    return [index.find_restaurants(order_products) for order_products in orders]
+
+
+class Command(BaseCommand):
+    help = "Сравнивает подбор ресторанов для заказов: перебор множеств против битового индекса"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurants", type=int, default=1000)
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--orders", type=int, default=10000)
+        parser.add_argument("--items", type=int, default=3, help="позиций в заказе")
+        parser.add_argument("--density", type=float, default=0.9, help="доля продуктов в меню ресторана")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        restaurants = [
+            Restaurant(id=restaurant_id, name=f"Ресторан {restaurant_id}")
+            for restaurant_id in range(1, options["restaurants"] + 1)
+        ]
+        restaurants_by_id = {restaurant.id: restaurant for restaurant in restaurants}
+        product_ids = range(1, options["products"] + 1)
+        menu = [
+            (restaurant.id, product_id)
+            for restaurant in restaurants
+            for product_id in product_ids
+            if rng.random() < options["density"]
+        ]
+        orders = [
+            set(rng.sample(product_ids, options["items"]))
+            for _ in range(options["orders"])
+        ]
+
+        started_at = time.perf_counter()
+        naive_result = find_restaurants_naive(menu, restaurants_by_id, orders)
+        naive_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        indexed_result = find_restaurants_indexed(menu, restaurants, orders)
+        indexed_time = time.perf_counter() - started_at
+
+        mismatches = sum(
+            {rest.id for rest in naive} != {rest.id for rest in indexed}
+            for naive, indexed in zip(naive_result, indexed_result)
+        )
+        self.stdout.write(
+            f"{options['restaurants']} ресторанов × {options['products']} продуктов × "
+            f"{options['orders']} заказов, пунктов меню: {len(menu)}"
+        )
+        self.stdout.write(f"Перебор множеств: {naive_time:.3f} с")
+        self.stdout.write(f"Битовый индекс:   {indexed_time:.3f} с (включая построение)")
+        self.stdout.write(f"Ускорение: ×{naive_time / indexed_time:.1f}, расхождений: {mismatches}")
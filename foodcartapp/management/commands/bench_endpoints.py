@@ -0,0 +1,149 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from foodcartapp.synthetic import create_manager, generate_dataset
+
+
+def parse_scale(value):
+    try:
+        restaurants, products, orders = map(int, value.split("x"))
+    except ValueError:
+        raise CommandError(f"Масштаб задаётся как РЕСТОРАНЫxПРОДУКТЫxЗАКАЗЫ, получено {value}")
+    return restaurants, products, orders
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет задержку, число SQL-запросов и пиковую память публичных и менеджерских "
+        "страниц на синтетических данных во временной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            action="append",
+            type=parse_scale,
+            help="РЕСТОРАНЫxПРОДУКТЫxЗАКАЗЫ, можно указать несколько раз",
+        )
+        parser.add_argument("--menu-density", type=float, default=0.8)
+        parser.add_argument("--repeat", type=int, default=20, help="запросов на эндпоинт")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", default="bench_output.json")
+
+    def handle(self, *args, **options):
+        scales = options["scale"] or [(5, 20, 100), (50, 100, 1000), (200, 300, 5000)]
+        old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=["testserver"]):
+                results = [self.run_scale(scale, options) for scale in scales]
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "menu_density": options["menu_density"],
+            "scales": results,
+        }
+        with open(options["output"], "w") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+    def run_scale(self, scale, options):
+        restaurants, products, orders = scale
+        self.stdout.write(f"Масштаб: {restaurants} ресторанов, {products} продуктов, {orders} заказов")
+        self.flush()
+        cache.clear()
+        dataset = generate_dataset(
+            restaurants=restaurants,
+            products=products,
+            menu_density=options["menu_density"],
+            orders=orders,
+            seed=options["seed"],
+        )
+        manager = create_manager()
+        order_payload = json.dumps({
+            "firstname": "Иван",
+            "lastname": "Петров",
+            "phonenumber": "+79291234567",
+            "address": "Москва, ул. Клиентская, 1",
+            "products": [
+                {"product": product.id, "quantity": 1} for product in dataset["products"][:3]
+            ],
+        })
+
+        public_client = Client()
+        manager_client = Client()
+        manager_client.force_login(manager)
+        endpoints = [
+            ("GET /api/products/", lambda: public_client.get("/api/products/")),
+            ("POST /api/order/", lambda: public_client.post(
+                "/api/order/", order_payload, content_type="application/json"
+            )),
+            ("GET /manager/orders/", lambda: manager_client.get("/manager/orders/")),
+            ("GET /manager/products/", lambda: manager_client.get("/manager/products/")),
+            ("GET /admin/foodcartapp/order/", lambda: manager_client.get("/admin/foodcartapp/order/")),
+        ]
+        return {
+            "restaurants": restaurants,
+            "products": products,
+            "orders": orders,
+            "endpoints": {
+                name: self.measure(name, request, options["repeat"])
+                for name, request in endpoints
+            },
+        }
+
+    def flush(self):
+        call_command("flush", interactive=False, verbosity=0)
+
+    def measure(self, name, request, repeat):
+        reset_queries()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        query_count = len(queries)
+        duplicate_queries = query_count - len({query["sql"] for query in queries})
+        if response.status_code >= 400:
+            raise CommandError(f"{name}: код ответа {response.status_code}")
+
+        latencies = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            request()
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        result = {
+            "p50_ms": round(percentile(latencies, 0.5), 2),
+            "p90_ms": round(percentile(latencies, 0.9), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "mean_ms": round(statistics.mean(latencies), 2),
+            "queries": query_count,
+            "duplicate_queries": duplicate_queries,
+            "peak_memory_kb": round(peak_memory / 1024, 1),
+        }
+        self.stdout.write(
+            f"  {name}: p50 {result['p50_ms']} мс, p99 {result['p99_ms']} мс, "
+            f"запросов {result['queries']}, память {result['peak_memory_kb']} КБ"
+        )
+        return result
@@ -0,0 +1,114 @@
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from foodcartapp.management.commands.bench_endpoints import percentile
+from foodcartapp.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет пропускную способность и p99 приёма заказов параллельными клиентами "
+        "с групповым коммитом и без него во временной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=2000, help="заказов в каждом режиме")
+        parser.add_argument("--concurrency", type=int, default=32, help="параллельных клиентов")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--max-delay-ms", type=float, default=5.0)
+        parser.add_argument("--output", default="bench_order_intake.json")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            # Общая in-memory база не даёт честного fsync и блокировок файла.
+            temp_dir = tempfile.mkdtemp()
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(temp_dir, "bench.sqlite3")
+        old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=["testserver"],
+                ORDER_GROUP_COMMIT_BATCH_SIZE=options["batch_size"],
+                ORDER_GROUP_COMMIT_MAX_DELAY_MS=options["max_delay_ms"],
+            ):
+                products = generate_dataset(
+                    restaurants=5, products=20, menu_density=1, orders=0
+                )["products"]
+                payload = json.dumps({
+                    "firstname": "Иван",
+                    "lastname": "Петров",
+                    "phonenumber": "+79291234567",
+                    "address": "Москва, ул. Клиентская, 1",
+                    "products": [
+                        {"product": product.id, "quantity": 1} for product in products[:3]
+                    ],
+                })
+                results = {
+                    mode: self.run_mode(mode, enabled, payload, options)
+                    for mode, enabled in [("per_request", False), ("group_commit", True)]
+                }
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "orders": options["orders"],
+            "concurrency": options["concurrency"],
+            "batch_size": options["batch_size"],
+            "max_delay_ms": options["max_delay_ms"],
+            "modes": results,
+        }
+        with open(options["output"], "w") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+    def run_mode(self, mode, enabled, payload, options):
+        latencies = []
+        errors = []
+        orders_per_client = max(1, options["orders"] // options["concurrency"])
+
+        def post_orders():
+            client = Client(raise_request_exception=False)
+            try:
+                for _ in range(orders_per_client):
+                    started_at = time.perf_counter()
+                    response = client.post("/api/order/", payload, content_type="application/json")
+                    latencies.append((time.perf_counter() - started_at) * 1000)
+                    if response.status_code != 201:
+                        errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        with override_settings(ORDER_GROUP_COMMIT_ENABLED=enabled):
+            clients = [
+                threading.Thread(target=post_orders) for _ in range(options["concurrency"])
+            ]
+            started_at = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - started_at
+
+        result = {
+            "orders_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.5), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "errors": len(errors),
+        }
+        self.stdout.write(
+            f"  {mode}: {result['orders_per_second']} заказов/с, p50 {result['p50_ms']} мс, "
+            f"p99 {result['p99_ms']} мс, ошибок {result['errors']}"
+        )
+        return result
@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from foodcartapp.order_intake import validate_order_payload
+from foodcartapp.serializers import OrderSerializer
+from foodcartapp.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает быструю проверку заказа с OrderSerializer: проверок в секунду "
+        "и запросов POST /api/order/ в секунду на один воркер во временной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--validations", type=int, default=5000)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--items", type=int, default=3, help="позиций в заказе")
+
+    def handle(self, *args, **options):
+        old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=["testserver"]):
+                products = generate_dataset(
+                    restaurants=5, products=max(20, options["items"]), menu_density=1, orders=0
+                )["products"]
+                payload = {
+                    "firstname": "Иван",
+                    "lastname": "Петров",
+                    "phonenumber": "+79291234567",
+                    "address": "Москва, ул. Клиентская, 1",
+                    "products": [
+                        {"product": product.id, "quantity": 1}
+                        for product in products[:options["items"]]
+                    ],
+                }
+                self.bench_validation(payload, options["validations"])
+                self.bench_requests(payload, options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+    def bench_validation(self, payload, count):
+        def validate_with_serializer():
+            serializer = OrderSerializer(data=payload)
+            serializer.is_valid(raise_exception=True)
+
+        def validate_fast():
+            if validate_order_payload(payload)[0] is None:
+                raise AssertionError("быстрая проверка отклонила корректный заказ")
+
+        self.stdout.write(f"Проверка заказа, {count} раз:")
+        serializer_rate = self.measure(validate_with_serializer, count)
+        fast_rate = self.measure(validate_fast, count)
+        self.report(serializer_rate, fast_rate, "проверок/с")
+
+    def bench_requests(self, payload, count):
+        client = Client()
+        body = json.dumps(payload)
+
+        def post_order():
+            response = client.post("/api/order/", body, content_type="application/json")
+            if response.status_code != 201:
+                raise AssertionError(f"код ответа {response.status_code}")
+
+        self.stdout.write(f"POST /api/order/ в одном потоке, {count} запросов:")
+        with override_settings(ORDER_FAST_PATH_ENABLED=False):
+            serializer_rate = self.measure(post_order, count)
+        with override_settings(ORDER_FAST_PATH_ENABLED=True):
+            fast_rate = self.measure(post_order, count)
+        self.report(serializer_rate, fast_rate, "запросов/с")
+
+    def measure(self, action, count):
+        action()
+        started_at = time.perf_counter()
+        for _ in range(count):
+            action()
+        return count / (time.perf_counter() - started_at)
+
+    def report(self, serializer_rate, fast_rate, unit):
+        self.stdout.write(f"  OrderSerializer:   {serializer_rate:.0f} {unit}")
+        self.stdout.write(f"  быстрая проверка: {fast_rate:.0f} {unit}")
+        self.stdout.write(f"  ускорение: ×{fast_rate / serializer_rate:.1f}")
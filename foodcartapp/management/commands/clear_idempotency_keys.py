@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.idempotency import clear_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Удаляет ключи идемпотентности старше IDEMPOTENCY_KEY_TTL_HOURS"
+
+    def handle(self, *args, **options):
+        deleted = clear_expired_keys()
+        self.stdout.write(f"Удалено ключей: {deleted}")
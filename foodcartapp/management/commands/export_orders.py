@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.exports import (
+    EXPORT_FORMATS,
+    get_export_orders,
+    iter_export_orders,
+    parse_export_filters,
+    render_export,
+)
+
+
+class Command(BaseCommand):
+    help = "Выгружает заказы с позициями в CSV или JSONL, не держа их в памяти"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--date-from", help="ГГГГ-ММ-ДД, включительно")
+        parser.add_argument("--date-to", help="ГГГГ-ММ-ДД, включительно")
+        parser.add_argument("--status", help="по умолчанию все, кроме COMPLETED")
+        parser.add_argument("--payment-method", help="CASH или ONLINE")
+        parser.add_argument("--restaurant", help="id ресторана или none")
+        parser.add_argument("--chunk-size", type=int, default=settings.ORDER_EXPORT_CHUNK_SIZE)
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--output", help="файл для выгрузки, по умолчанию stdout")
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_export_filters(options)
+        except ValueError as error:
+            raise CommandError(error)
+        orders = get_export_orders(filters).using(options["database"])
+        content = render_export(
+            iter_export_orders(orders, options["chunk_size"]), options["format"]
+        )
+        if options["output"] is None:
+            for batch in content:
+                self.stdout.write(batch, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as output:
+            for batch in content:
+                output.write(batch)
+        self.stdout.write(f"Заказы выгружены в {options['output']}")
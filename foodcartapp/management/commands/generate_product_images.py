@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.images import update_product_images
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = "Создаёт уменьшенные копии картинок продуктов в WebP и JPEG"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="пересоздать копии, даже если они актуальны"
+        )
+
+    def handle(self, *args, **options):
+        updated = 0
+        products = Product.objects.exclude(image="").only("id", "image", "image_derivatives")
+        for product in products.iterator(chunk_size=100):
+            if update_product_images(product, force=options["force"]):
+                updated += 1
+        self.stdout.write(f"Обработано картинок: {updated}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.capabilities import rebuild_capabilities
+
+
+class Command(BaseCommand):
+    help = "Пересобирает таблицу возможностей ресторанов по их меню"
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_capabilities()
+        self.stdout.write(f"Пересобрано записей: {rebuilt}")
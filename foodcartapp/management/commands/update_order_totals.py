@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сохранённую стоимость заказов по их позициям"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="только проверить, что сохранённая стоимость совпадает с суммой позиций",
+        )
+
+    def handle(self, *args, **options):
+        if not options["verify"]:
+            updated = Order.objects.recalculate_total_price()
+            self.stdout.write(f"Пересчитано заказов: {updated}")
+
+        mismatched = (
+            Order.objects.with_calculated_total_price()
+            .exclude(total_price=F("calculated_total_price"))
+            .values_list("id", flat=True)
+        )
+        mismatched_ids = list(mismatched[:20])
+        if mismatched_ids:
+            raise CommandError(
+                f"Стоимость расходится с позициями: {mismatched.count()} заказов, "
+                f"например {mismatched_ids}"
+            )
+        self.stdout.write("Стоимость всех заказов совпадает с суммой позиций")
@@ -0,0 +1,27 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_order_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+    items_total = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(F('price') * F('quantity')))
+        .values('total')
+    )
+    Order.objects.update(total_price=Coalesce(Subquery(items_total), Decimal(0)))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('foodcartapp', '0054_order_total_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_order_total_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_fill_order_total_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantCapability',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='capability', serialize=False, to='foodcartapp.restaurant', verbose_name='ресторан')),
+                ('product_ids', models.JSONField(default=list, verbose_name='продукты в продаже')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='версия')),
+            ],
+            options={
+                'verbose_name': 'возможности ресторана',
+                'verbose_name_plural': 'возможности ресторанов',
+            },
+        ),
+    ]
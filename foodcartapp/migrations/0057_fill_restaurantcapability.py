@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def fill_restaurant_capabilities(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    RestaurantMenuItem = apps.get_model('foodcartapp', 'RestaurantMenuItem')
+    RestaurantCapability = apps.get_model('foodcartapp', 'RestaurantCapability')
+    product_ids = {restaurant_id: [] for restaurant_id in Restaurant.objects.values_list('pk', flat=True)}
+    menu = (
+        RestaurantMenuItem.objects.filter(availability=True)
+        .values_list('restaurant_id', 'product_id')
+        .order_by('restaurant_id', 'product_id')
+    )
+    for restaurant_id, product_id in menu:
+        product_ids[restaurant_id].append(product_id)
+    RestaurantCapability.objects.bulk_create(
+        [
+            RestaurantCapability(restaurant_id=restaurant_id, product_ids=products, version=1)
+            for restaurant_id, products in product_ids.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('foodcartapp', '0056_restaurantcapability'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_restaurant_capabilities, migrations.RunPython.noop),
+    ]
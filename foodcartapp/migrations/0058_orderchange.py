@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_fill_restaurantcapability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.PositiveIntegerField(db_index=True, verbose_name='ID заказа')),
+                ('kind', models.CharField(choices=[('CREATED', 'Создан'), ('UPDATED', 'Изменён'), ('DELETED', 'Удалён')], max_length=10, verbose_name='Тип изменения')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение заказа',
+                'verbose_name_plural': 'Изменения заказов',
+                'ordering': ['id'],
+            },
+        ),
+    ]
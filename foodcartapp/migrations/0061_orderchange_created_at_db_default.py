@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:33
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderchange',
+            name='created_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True, verbose_name='Время изменения'),
+        ),
+    ]
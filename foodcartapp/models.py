@@ -1,11 +1,18 @@
-from collections import defaultdict
-
 import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import F, Sum
+from django.db import connections, models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .eligibility import attach_available_restaurants
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,6 +62,9 @@ class Product(models.Model):
         "цена", max_digits=8, decimal_places=2, validators=[MinValueValidator(0.01)]
     )
     image = models.ImageField("картинка")
+    image_derivatives = models.JSONField(
+        "уменьшенные копии картинки", default=dict, blank=True, editable=False
+    )
     special_status = models.BooleanField("спец.предложение", default=False, db_index=True)
     description = models.TextField("описание")
 
@@ -67,6 +77,36 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def get_image_variants(self):
+        """URL уменьшенных копий картинки, от меньшей к большей."""
+        if not self.image or self.image_derivatives.get("source") != self.image.name:
+            return []
+        storage = self.image.storage
+        return [
+            {
+                "size": variant["size"],
+                "width": variant["width"],
+                "height": variant["height"],
+                "webp": storage.url(variant["webp"]),
+                "jpeg": storage.url(variant["jpeg"]),
+            }
+            for variant in self.image_derivatives["variants"]
+        ]
+
+    def get_thumbnail(self, size):
+        """Наименьшая копия не меньше size, а пока копий нет — исходная картинка."""
+        variants = self.get_image_variants()
+        for variant in variants:
+            if variant["size"] >= size:
+                return variant
+        if variants:
+            return variants[-1]
+        return {"webp": None, "jpeg": self.image.url if self.image else None}
+
+    @property
+    def thumbnail(self):
+        return self.get_thumbnail(64)
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -91,33 +131,71 @@ class RestaurantMenuItem(models.Model):
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
-class OrderQuerySet(models.QuerySet):
-    def with_total_price(self):
-        return self.annotate(total_price=Sum(F("items__price") * F("items__quantity")))
 
-    def with_available_restaurants(self):
-        menu_items = RestaurantMenuItem.objects.filter(availability=True).select_related(
-            "restaurant", "product"
+class RestaurantCapability(models.Model):
+    restaurant = models.OneToOneField(
+        Restaurant,
+        verbose_name="ресторан",
+        related_name="capability",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    product_ids = models.JSONField("продукты в продаже", default=list)
+    version = models.PositiveIntegerField("версия", default=0)
+
+    class Meta:
+        verbose_name = "возможности ресторана"
+        verbose_name_plural = "возможности ресторанов"
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {len(self.product_ids)} продуктов (v{self.version})"
+
+
+class OrderQuerySet(models.QuerySet):
+    def recalculate_total_price(self):
+        items_total = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .values("order")
+            .annotate(total=Sum(F("price") * F("quantity")))
+            .values("total")
         )
-        rests_with_products = defaultdict(set)
-        for item in menu_items:
-            rests_with_products[item.restaurant].add(item.product_id)
-
-        for order in self:
-            order_products = set(item.product_id for item in order.items.all())
-            available_restaurants = [
-                rest
-                for rest, rest_products in rests_with_products.items()
-                if order_products.issubset(rest_products)
-            ]
-            logger.debug(
-                f"Order {order.id}: products {order_products}, "
-                f"available restaurants {[r.name for r in available_restaurants]}"
+        return self.update(total_price=Coalesce(Subquery(items_total), Decimal(0)))
+
+    def with_calculated_total_price(self):
+        return self.annotate(
+            calculated_total_price=Coalesce(
+                Sum(F("items__price") * F("items__quantity")), Decimal(0)
             )
-            setattr(order, "available_restaurants", available_restaurants)
+        )
+
+    def with_available_restaurants(self):
+        attach_available_restaurants(self)
         return self
 
+    def filter_for_manager(self, status="", payment_method="", restaurant=""):
+        """Фильтры страницы заказов менеджера, неизвестные значения не учитываются.
+
+        Без статуса показываются все заказы, кроме завершённых.
+        """
+        orders = self
+        if status in dict(Order.STATUS_CHOICES):
+            orders = orders.filter(status=status)
+        else:
+            orders = orders.exclude(status="COMPLETED")
+        if payment_method in dict(Order.PAYMENT_METHOD_CHOICES):
+            orders = orders.filter(payment_method=payment_method)
+        if restaurant == "none":
+            orders = orders.filter(restaurant__isnull=True)
+        elif restaurant.isdigit():
+            orders = orders.filter(restaurant_id=restaurant)
+        return orders
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -161,6 +239,9 @@ class Order(models.Model):
         blank=True,
         db_index=True,
     )
+    total_price = models.DecimalField(
+        "Стоимость заказа", max_digits=10, decimal_places=2, default=0
+    )
 
     objects = OrderQuerySet.as_manager()
 
@@ -202,4 +283,109 @@ class OrderItem(models.Model):
         ordering = ["id"]
 
     def __str__(self):
-        return f"{self.product.name} ({self.quantity} шт.)"
\ No newline at end of file
+        return f"{self.product.name} ({self.quantity} шт.)"
+
+
+class OrderChangeQuerySet(models.QuerySet):
+    # Базы, где номера изменений становятся видны строго по возрастанию.
+    COMMIT_ORDERED_VENDORS = {"postgresql", "sqlite"}
+    # Ключ pg_advisory_xact_lock, под которым пишутся изменения заказов.
+    ADVISORY_LOCK_ID = 7_240_301
+
+    def record(self, order_ids, kind):
+        """Записывает изменения так, чтобы номера становились видны по порядку.
+
+        На PostgreSQL вставка идёт под транзакционной advisory-блокировкой:
+        её отпускает только коммит, поэтому следующая транзакция получит
+        больший номер уже после того, как меньший стал виден. SQLite и так
+        пишет одной транзакцией за раз.
+        """
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db, savepoint=False):
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [self.ADVISORY_LOCK_ID])
+            return self.bulk_create(
+                [OrderChange(order_id=order_id, kind=kind) for order_id in order_ids]
+            )
+
+    def settled(self):
+        """Записи, за которыми курсор не пропустит более ранний номер.
+
+        На PostgreSQL и SQLite номера видны в порядке коммита, и годятся все
+        записи. На других базах номер выдаётся при вставке, а виден после
+        коммита, поэтому отдаются записи старше ORDER_CHANGES_SETTLE_SECONDS
+        по часам базы. Транзакция, которая пишет дольше этого окна, может
+        быть пропущена клиентом, уже сдвинувшим курсор.
+        """
+        if connections[self.db].vendor in self.COMMIT_ORDERED_VENDORS:
+            return self
+        settle_delay = timedelta(seconds=settings.ORDER_CHANGES_SETTLE_SECONDS)
+        return self.filter(created_at__lte=Now() - settle_delay)
+
+    def collapse_after(self, change_id, limit):
+        """Изменения после курсора, схлопнутые по заказам.
+
+        Возвращает {order_id: (номер последнего изменения, тип)}, новый курсор
+        и признак, что за пределами limit остались ещё изменения.
+        """
+        changes = list(
+            self.settled()
+            .filter(id__gt=change_id)
+            .order_by("id")
+            .values_list("id", "order_id", "kind")[:limit + 1]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        collapsed = {}
+        for current_id, order_id, kind in changes:
+            _, previous_kind = collapsed.get(order_id, (None, None))
+            if previous_kind == OrderChange.CREATED and kind == OrderChange.UPDATED:
+                kind = OrderChange.CREATED
+            collapsed[order_id] = (current_id, kind)
+        last_id = changes[-1][0] if changes else change_id
+        return collapsed, last_id, has_more
+
+
+class OrderChange(models.Model):
+    CREATED = "CREATED"
+    UPDATED = "UPDATED"
+    DELETED = "DELETED"
+    KIND_CHOICES = [(CREATED, "Создан"), (UPDATED, "Изменён"), (DELETED, "Удалён")]
+
+    order_id = models.PositiveIntegerField("ID заказа", db_index=True)
+    kind = models.CharField("Тип изменения", max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField("Время изменения", db_default=Now(), db_index=True)
+
+    objects = OrderChangeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Изменение заказа"
+        verbose_name_plural = "Изменения заказов"
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"#{self.id}: заказ {self.order_id} {self.get_kind_display().lower()}"
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField("Ключ идемпотентности", max_length=255, unique=True)
+    request_hash = models.CharField("Хэш запроса", max_length=64)
+    status_code = models.PositiveSmallIntegerField("Код ответа", null=True, blank=True)
+    response = models.JSONField("Ответ", encoder=DjangoJSONEncoder, null=True, blank=True)
+    order = models.ForeignKey(
+        Order,
+        verbose_name="Заказ",
+        related_name="idempotency_keys",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField("Время создания", default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+
+    def __str__(self):
+        return self.key
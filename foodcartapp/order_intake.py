@@ -0,0 +1,128 @@
+import re
+
+from phonenumber_field.phonenumber import PhoneNumber
+from phonenumbers import NumberParseException
+from rest_framework import serializers
+
+from .models import Order, Product
+
+_datetime_field = serializers.DateTimeField()
+
+# Символы, которые CharField в DRF отвергает валидаторами.
+PROHIBITED_CHARACTERS = re.compile("[\x00\ud800-\udfff]")
+
+
+def get_product_prices(product_ids):
+    """Текущие цены продуктов {id: цена} одним запросом, удалённых продуктов в ответе нет."""
+    return dict(Product.objects.filter(id__in=set(product_ids)).values_list("id", "price"))
+
+
+def compile_text_fields(*names):
+    return [
+        (name, Order._meta.get_field(name).max_length)
+        for name in names
+    ]
+
+
+class OrderPayloadValidator:
+    """Быстрая проверка типичного заказа без сериализаторов DRF.
+
+    Принимает только строгое подмножество того, что принимает OrderSerializer:
+    строки в текстовых полях, целые числа в позициях. Существование продуктов
+    проверяет validate_order_payload. На всё остальное возвращает None — такой запрос, в том числе любой
+    ошибочный, проверяет OrderSerializer, и формат ошибок остаётся прежним.
+    """
+
+    required_fields = compile_text_fields("firstname", "lastname", "address")
+    phonenumber_max_length = Order._meta.get_field("phonenumber").max_length
+
+    def validate(self, data):
+        if not isinstance(data, dict):
+            return None
+        validated = {}
+        for name, max_length in self.required_fields:
+            value = data.get(name)
+            if type(value) is not str:
+                return None
+            value = value.strip()
+            if not value or len(value) > max_length or PROHIBITED_CHARACTERS.search(value):
+                return None
+            validated[name] = value
+
+        phonenumber = data.get("phonenumber")
+        if type(phonenumber) is not str:
+            return None
+        phonenumber = phonenumber.strip()
+        if not phonenumber or len(phonenumber) > self.phonenumber_max_length:
+            return None
+        if PROHIBITED_CHARACTERS.search(phonenumber):
+            return None
+        try:
+            parsed_phonenumber = PhoneNumber.from_string(phonenumber)
+        except NumberParseException:
+            return None
+        if not parsed_phonenumber.is_valid():
+            return None
+        validated["phonenumber"] = parsed_phonenumber
+
+        comment = data.get("comment", "")
+        if type(comment) is not str or PROHIBITED_CHARACTERS.search(comment):
+            return None
+        validated["comment"] = comment.strip()
+
+        products = data.get("products")
+        if type(products) is not list or not products:
+            return None
+        items = []
+        for item in products:
+            if type(item) is not dict:
+                return None
+            product_id = item.get("product")
+            quantity = item.get("quantity")
+            if type(product_id) is not int or type(quantity) is not int:
+                return None
+            if quantity < 1:
+                return None
+            items.append({"product": product_id, "quantity": quantity})
+        validated["items"] = items
+        return validated
+
+
+order_payload_validator = OrderPayloadValidator()
+
+
+def validate_order_payload(data):
+    """Быстрая проверка заказа и цены его продуктов.
+
+    Возвращает (данные заказа, цены) или (None, None), если заказ должен
+    проверить OrderSerializer — в том числе когда продукт уже удалён.
+    """
+    order_data = order_payload_validator.validate(data)
+    if order_data is None:
+        return None, None
+    product_ids = {item["product"] for item in order_data["items"]}
+    prices = get_product_prices(product_ids)
+    if len(prices) != len(product_ids):
+        return None, None
+    return order_data, prices
+
+
+def render_order(order, order_data, prices):
+    """Ответ в формате OrderSerializer, собранный из уже известных данных."""
+    return {
+        "id": order.id,
+        "firstname": order_data["firstname"],
+        "lastname": order_data["lastname"],
+        "phonenumber": str(order_data["phonenumber"]),
+        "address": order_data["address"],
+        "products": [
+            {
+                "product": item["product"],
+                "quantity": item["quantity"],
+                "price": f"{prices[item['product']]:.2f}",
+            }
+            for item in order_data["items"]
+        ],
+        "comment": order_data["comment"],
+        "created_at": _datetime_field.to_representation(order.created_at),
+    }
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.db import transaction
 from rest_framework import serializers
 from phonenumber_field.phonenumber import PhoneNumber
-from .models import Order, OrderItem, Product
+from .idempotency import claim_keys, link_orders
+from .models import Order, OrderChange, OrderItem, Product
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -48,11 +50,32 @@ class OrderSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
+        if settings.ORDER_GROUP_COMMIT_ENABLED:
+            from .group_commit import get_order_writer
+
+            order_data = {
+                **validated_data,
+                'items': [
+                    {'product': item['product'].id, 'quantity': item['quantity']}
+                    for item in validated_data['items']
+                ],
+            }
+            prices = {item['product'].id: item['product'].price for item in validated_data['items']}
+            return get_order_writer().write(
+                order_data,
+                prices,
+                self.context.get('idempotency_key'),
+                timeout=settings.ORDER_GROUP_COMMIT_TIMEOUT,
+            )
         with transaction.atomic():
+            claim_keys([self.context.get('idempotency_key')])
             items_data = validated_data.pop('items')
             if isinstance(validated_data['phonenumber'], PhoneNumber):
                 validated_data['phonenumber'] = str(validated_data['phonenumber'])
             validated_data.setdefault('comment', '')
+            validated_data['total_price'] = sum(
+                item_data['product'].price * item_data['quantity'] for item_data in items_data
+            )
             order = Order.objects.create(**validated_data)
             for item_data in items_data:
                 product = item_data['product']
@@ -62,4 +85,117 @@ class OrderSerializer(serializers.ModelSerializer):
                     quantity=item_data['quantity'],
                     price=product.price
                 )
-            return order
\ No newline at end of file
+            OrderChange.objects.record([order.id], OrderChange.CREATED)
+            link_orders([self.context.get('idempotency_key')], [order])
+            return order
+
+
+class OrderChangeSerializer(serializers.ModelSerializer):
+    products = OrderItemSerializer(many=True, source='items', read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id',
+            'firstname',
+            'lastname',
+            'phonenumber',
+            'address',
+            'products',
+            'comment',
+            'status',
+            'payment_method',
+            'restaurant',
+            'total_price',
+            'created_at',
+            'called_at',
+            'delivered_at',
+        ]
+        read_only_fields = fields
+
+
+class BatchOrderItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BatchOrderSerializer(OrderSerializer):
+    products = BatchOrderItemSerializer(many=True, source='items', allow_empty=False)
+
+
+def validate_orders_batch(orders_data):
+    order_serializers = [BatchOrderSerializer(data=order_data) for order_data in orders_data]
+    valid_serializers = [serializer for serializer in order_serializers if serializer.is_valid()]
+    product_ids = {
+        item['product']
+        for serializer in valid_serializers
+        for item in serializer.validated_data['items']
+    }
+    products = Product.objects.in_bulk(product_ids)
+
+    does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+    validated_orders = []
+    errors = []
+    for index, serializer in enumerate(order_serializers):
+        if serializer.errors:
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        items_errors = [
+            {} if item['product'] in products
+            else {'product': [does_not_exist.format(pk_value=item['product'])]}
+            for item in serializer.validated_data['items']
+        ]
+        if any(items_errors):
+            errors.append({'index': index, 'errors': {'products': items_errors}})
+            continue
+        validated_orders.append((index, serializer.validated_data))
+    return validated_orders, errors, products
+
+
+def bulk_create_orders(orders_data, prices, idempotency_keys=()):
+    """Создаёт заказы с позициями в одной транзакции пакетными вставками.
+
+    Позиции в orders_data ссылаются на продукты по id, цены берутся из prices.
+    idempotency_keys — ключи идемпотентности заказов по порядку, None для
+    заказов без ключа.
+    """
+    orders = []
+    for order_data in orders_data:
+        order_fields = {key: value for key, value in order_data.items() if key != 'items'}
+        order_fields['phonenumber'] = str(order_fields['phonenumber'])
+        order_fields.setdefault('comment', '')
+        order_fields['total_price'] = sum(
+            prices[item['product']] * item['quantity'] for item in order_data['items']
+        )
+        orders.append(Order(**order_fields))
+
+    with transaction.atomic():
+        claim_keys(idempotency_keys)
+        Order.objects.bulk_create(orders, batch_size=500)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product_id=item['product'],
+                    quantity=item['quantity'],
+                    price=prices[item['product']],
+                )
+                for order, order_data in zip(orders, orders_data)
+                for item in order_data['items']
+            ],
+            batch_size=500,
+        )
+        OrderChange.objects.record([order.id for order in orders], OrderChange.CREATED)
+        link_orders(idempotency_keys, orders)
+    return orders
+
+
+def create_orders_batch(validated_orders, products):
+    orders = bulk_create_orders(
+        [validated_data for _, validated_data in validated_orders],
+        {product_id: product.price for product_id, product in products.items()},
+    )
+    return [
+        {'index': index, 'id': order.id}
+        for order, (index, _) in zip(orders, validated_orders)
+    ]
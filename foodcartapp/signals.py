@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from places.models import Place
+from places.signals import geocoding_rescan, places_geocoded
+from places.utils import enqueue_geocoding
+
+from .capabilities import change_capability, touch_capability
+from .images import update_product_images
+from .models import Order, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .versions import CATALOG_VERSION_KEY, LOCATIONS_VERSION_KEY, MENU_VERSION_KEY, bump_version
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def update_capability_on_save(sender, instance, created, **kwargs):
+    current = (instance.restaurant_id, instance.product_id)
+    loaded = getattr(instance, "_loaded_values", None)
+    if loaded and "availability" in loaded:
+        previous = (loaded["restaurant_id"], loaded["product_id"]) if loaded["availability"] else None
+    elif created:
+        previous = None
+    else:
+        previous = current if not instance.availability else None
+    if previous and (previous != current or not instance.availability):
+        change_capability(previous[0], removed=[previous[1]])
+    if instance.availability and previous != current:
+        change_capability(current[0], added=[current[1]])
+    instance._loaded_values = {
+        "restaurant_id": instance.restaurant_id,
+        "product_id": instance.product_id,
+        "availability": instance.availability,
+    }
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_capability_on_delete(sender, instance, **kwargs):
+    change_capability(instance.restaurant_id, removed=[instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+def generate_product_images(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.image_derivatives.get("source") != instance.image.name:
+        transaction.on_commit(lambda: update_product_images(instance))
+
+
+@receiver(post_save, sender=Restaurant)
+def update_capability_on_restaurant_save(sender, instance, created, **kwargs):
+    if not created:
+        touch_capability(instance.pk)
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_menu(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(MENU_VERSION_KEY))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+@receiver(post_save, sender=Restaurant)
+def enqueue_restaurant_geocoding(sender, instance, **kwargs):
+    enqueue_geocoding([instance.address])
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def invalidate_locations(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(LOCATIONS_VERSION_KEY))
+
+
+@receiver(places_geocoded)
+def invalidate_locations_on_geocoding(sender, addresses, **kwargs):
+    if Restaurant.objects.filter(address__in=addresses).exists():
+        bump_version(LOCATIONS_VERSION_KEY)
+
+
+@receiver(geocoding_rescan)
+def collect_addresses_for_geocoding(sender, **kwargs):
+    """Адреса ресторанов и незавершённых заказов — те, что видит менеджер."""
+    addresses = set(Restaurant.objects.values_list("address", flat=True))
+    addresses.update(
+        Order.objects.exclude(status="COMPLETED").values_list("address", flat=True).distinct()
+    )
+    return addresses
@@ -0,0 +1,145 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from places.fake_geocoder import make_fake_coordinates
+from places.models import Place
+from places.normalization import normalize_address
+
+from .capabilities import rebuild_capabilities
+from .models import (
+    Order,
+    OrderChange,
+    OrderItem,
+    Product,
+    ProductCategory,
+    Restaurant,
+    RestaurantMenuItem,
+)
+
+BATCH_SIZE = 1000
+
+
+def generate_dataset(
+    restaurants=10,
+    products=50,
+    menu_density=0.8,
+    orders=100,
+    items_per_order=(1, 5),
+    addresses=None,
+    seed=1,
+):
+    """Заполняет базу синтетическими ресторанами, меню, заказами и координатами адресов."""
+    rng = random.Random(seed)
+    first_restaurant = Restaurant.objects.count()
+    first_product = Product.objects.count()
+    categories = ProductCategory.objects.bulk_create(
+        [ProductCategory(name=name) for name in ("Бургеры", "Напитки", "Десерты")]
+    )
+    created_restaurants = Restaurant.objects.bulk_create(
+        [
+            Restaurant(
+                name=f"Ресторан {number}",
+                address=f"Москва, ул. Ресторанная, {number}",
+                contact_phone="+7 (900) 000-00-00",
+            )
+            for number in range(first_restaurant, first_restaurant + restaurants)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    created_products = Product.objects.bulk_create(
+        [
+            Product(
+                name=f"Продукт {number}",
+                category=rng.choice(categories),
+                price=Decimal(rng.randint(50, 900)),
+                image="food.jpg",
+                description=f"Описание продукта {number}",
+            )
+            for number in range(first_product, first_product + products)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    RestaurantMenuItem.objects.bulk_create(
+        [
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in created_restaurants
+            for product in created_products
+            if rng.random() < menu_density
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    rebuild_capabilities([restaurant.id for restaurant in created_restaurants])
+
+    address_pool = [
+        f"Москва, ул. Клиентская, {number}"
+        for number in range(addresses or max(1, orders // 2))
+    ]
+    statuses = [status for status, _ in Order.STATUS_CHOICES]
+    payment_methods = [method for method, _ in Order.PAYMENT_METHOD_CHOICES]
+    order_items = []
+    created_orders = []
+    for _ in range(orders):
+        chosen_products = rng.sample(
+            created_products, min(rng.randint(*items_per_order), len(created_products))
+        )
+        quantities = [rng.randint(1, 3) for _ in chosen_products]
+        created_orders.append(
+            Order(
+                firstname="Иван",
+                lastname="Петров",
+                phonenumber="+79291234567",
+                address=rng.choice(address_pool),
+                status=rng.choice(statuses),
+                payment_method=rng.choice(payment_methods),
+                total_price=sum(
+                    product.price * quantity
+                    for product, quantity in zip(chosen_products, quantities)
+                ),
+            )
+        )
+        order_items.append(list(zip(chosen_products, quantities)))
+    Order.objects.bulk_create(created_orders, batch_size=BATCH_SIZE)
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for order, items in zip(created_orders, order_items)
+            for product, quantity in items
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    OrderChange.objects.bulk_create(
+        [OrderChange(order_id=order.id, kind=OrderChange.CREATED) for order in created_orders],
+        batch_size=BATCH_SIZE,
+    )
+
+    now = timezone.now()
+    Place.objects.bulk_create(
+        [
+            Place(
+                address=address,
+                normalized_address=normalize_address(address),
+                latitude=lat,
+                longitude=lon,
+                last_updated=now,
+            )
+            for address in address_pool + [restaurant.address for restaurant in created_restaurants]
+            for lat, lon in [make_fake_coordinates(address)]
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return {
+        "restaurants": created_restaurants,
+        "products": created_products,
+        "orders": created_orders,
+    }
+
+
+def create_manager(username="benchmark-manager"):
+    user, _ = User.objects.get_or_create(
+        username=username, defaults={"is_staff": True, "is_superuser": True}
+    )
+    return user
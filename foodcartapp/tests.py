@@ -0,0 +1,524 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from foodcartapp import urls as foodcartapp_urls
+from foodcartapp.eligibility import get_eligibility_index
+from foodcartapp.group_commit import GroupCommitWriter
+from foodcartapp.idempotency import hash_request
+from foodcartapp.locations import get_restaurant_locator
+from foodcartapp.models import (
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    Product,
+    Restaurant,
+    RestaurantMenuItem,
+)
+from foodcartapp.order_intake import validate_order_payload
+from foodcartapp.serializers import OrderSerializer, bulk_create_orders
+from foodcartapp.synthetic import create_manager, generate_dataset
+from places.models import GeocodingJob, Place
+from places.normalization import normalize_address
+from places.utils import rescan_geocoding
+from restaurateur import urls as restaurateur_urls
+from star_burger.query_stats import count_queries
+
+DATA_SIZES = [
+    {"restaurants": 3, "products": 10, "orders": 20},
+    {"restaurants": 12, "products": 40, "orders": 150},
+]
+
+
+def make_order_payload(products):
+    return {
+        "firstname": "Иван",
+        "lastname": "Петров",
+        "phonenumber": "+79291234567",
+        "address": "Москва, ул. Клиентская, 1",
+        "products": [{"product": product.id, "quantity": 1} for product in products[:3]],
+    }
+
+
+def post_json(client, url, payload, **headers):
+    return client.post(url, json.dumps(payload), content_type="application/json", headers=headers)
+
+
+def read_streaming(response):
+    b"".join(response.streaming_content)
+    return response
+
+
+QUERY_BUDGETS = {
+    foodcartapp_urls: {
+        "banners/": (2, lambda client, products: client.get("/api/banners/")),
+        "products/": (2, lambda client, products: client.get("/api/products/")),
+        "order/": (9, lambda client, products: post_json(
+            client, "/api/order/", make_order_payload(products)
+        )),
+        "orders/batch/": (9, lambda client, products: post_json(
+            client, "/api/orders/batch/", [make_order_payload(products)] * 3
+        )),
+        "orders/changes/": (5, lambda client, products: client.get("/api/orders/changes/")),
+    },
+    restaurateur_urls: {
+        "": (0, lambda client, products: client.get("/manager/")),
+        "products/": (4, lambda client, products: client.get("/manager/products/")),
+        "restaurants/": (3, lambda client, products: client.get("/manager/restaurants/")),
+        "orders/": (11, lambda client, products: client.get("/manager/orders/")),
+        "orders/events/": (2, lambda client, products: client.get("/manager/orders/events/")),
+        "orders/export/": (4, lambda client, products: read_streaming(
+            client.get("/manager/orders/export/?format=jsonl")
+        )),
+        "login/": (0, lambda client, products: Client().get("/manager/login/")),
+        "logout/": (4, lambda client, products: client.post("/manager/logout/")),
+    },
+}
+
+
+class QueryBudgetTest(TestCase):
+    def test_every_url_has_budget(self):
+        for module, budgets in QUERY_BUDGETS.items():
+            for pattern in module.urlpatterns:
+                with self.subTest(module=module.__name__, route=str(pattern.pattern)):
+                    self.assertIn(str(pattern.pattern), budgets)
+
+    def test_query_counts_stay_within_budget_and_constant(self):
+        counts = {}
+        for data_size in DATA_SIZES:
+            products = generate_dataset(**data_size)["products"]
+            for module, budgets in QUERY_BUDGETS.items():
+                for route, (budget, make_request) in budgets.items():
+                    client = Client()
+                    client.force_login(create_manager())
+                    cache.clear()
+                    with count_queries() as stats:
+                        response = make_request(client, products)
+                    with self.subTest(module=module.__name__, route=route, **data_size):
+                        self.assertLess(response.status_code, 400)
+                        self.assertLessEqual(stats.count, budget)
+                    counts.setdefault((module.__name__, route), []).append(stats.count)
+
+        for (module_name, route), route_counts in counts.items():
+            with self.subTest(module=module_name, route=route):
+                self.assertEqual(
+                    len(set(route_counts)), 1,
+                    f"число запросов зависит от объёма данных: {route_counts}",
+                )
+
+
+class OrderPayloadValidatorTest(TestCase):
+    def setUp(self):
+        self.products = generate_dataset(restaurants=1, products=3, orders=0)["products"]
+        self.payload = make_order_payload(self.products)
+
+    def make_payloads(self):
+        product_id = self.products[0].id
+        variants = [
+            {},
+            {"comment": "  позвонить за час  "},
+            {"firstname": "  Иван  "},
+            {"firstname": "x" * 51},
+            {"firstname": "Иван\x00"},
+            {"firstname": 5},
+            {"lastname": None},
+            {"address": ""},
+            {"phonenumber": "+70000000000"},
+            {"phonenumber": "8 929 123-45-67"},
+            {"phonenumber": "не телефон"},
+            {"comment": None},
+            {"products": []},
+            {"products": "abc"},
+            {"products": [{"product": product_id, "quantity": 0}]},
+            {"products": [{"product": 999999, "quantity": 1}]},
+            {"products": [{"product": str(product_id), "quantity": "2"}]},
+            {"products": [{"product": product_id, "quantity": 1}, {"product": product_id, "quantity": 2}]},
+        ]
+        return [{**self.payload, **variant} for variant in variants] + [[], "строка"]
+
+    def test_fast_path_accepts_only_what_serializer_accepts(self):
+        for payload in self.make_payloads():
+            with self.subTest(payload=payload):
+                validated, _ = validate_order_payload(payload)
+                serializer = OrderSerializer(data=payload)
+                if validated is None:
+                    continue
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                self.assertEqual(
+                    [(item["product"].id, item["quantity"]) for item in serializer.validated_data["items"]],
+                    [(item["product"], item["quantity"]) for item in validated["items"]],
+                )
+                for field in ["firstname", "lastname", "address"]:
+                    self.assertEqual(serializer.validated_data[field], validated[field])
+
+    def test_fast_path_response_matches_serializer(self):
+        response = post_json(Client(), "/api/order/", self.payload).json()
+        order = Order.objects.get(pk=response["id"])
+        self.assertEqual(response, OrderSerializer(order).data)
+
+    def test_fast_path_uses_current_prices_and_products(self):
+        client = Client()
+        post_json(client, "/api/order/", self.payload)
+        Product.objects.filter(pk=self.products[0].pk).update(price=777)
+        response = post_json(client, "/api/order/", self.payload).json()
+        self.assertEqual(response["products"][0]["price"], "777.00")
+
+        product = Product.objects.create(name="Снятый продукт", price=100)
+        product.delete()
+        payload = {**self.payload, "products": [{"product": product.id, "quantity": 1}]}
+        response = post_json(client, "/api/order/", payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("products", response.json())
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        self.products = generate_dataset(restaurants=1, products=3, orders=0)["products"]
+        self.payload = make_order_payload(self.products)
+        self.client = Client()
+        # Ответы кэшируются в памяти процесса, поэтому у каждого теста свой ключ.
+        self.key = self.id()
+
+    def post(self, payload):
+        return post_json(self.client, "/api/order/", payload, **{"Idempotency-Key": self.key})
+
+    def test_replay_returns_the_same_order(self):
+        first = self.post(self.payload)
+        second = self.post(self.payload)
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.post(self.payload)
+        response = self.post({**self.payload, "firstname": "Пётр"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_in_flight(self):
+        IdempotencyKey.objects.create(key=self.key, request_hash=hash_request(self.payload))
+        self.assertEqual(self.post(self.payload).status_code, 409)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_abandoned_reservation_is_taken_over_after_lease(self):
+        IdempotencyKey.objects.create(
+            key=self.key,
+            request_hash=hash_request(self.payload),
+            created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS + 1),
+        )
+        self.assertEqual(self.post(self.payload).status_code, 201)
+
+    def write_order(self):
+        order_data = {
+            **self.payload,
+            "comment": "",
+            "items": [{"product": product.id, "quantity": 1} for product in self.products],
+        }
+        del order_data["products"]
+        [order] = bulk_create_orders(
+            [order_data], {product.id: product.price for product in self.products}, [self.key]
+        )
+        return order
+
+    def test_order_written_without_stored_response_is_replayed(self):
+        IdempotencyKey.objects.create(key=self.key, request_hash=hash_request(self.payload))
+        order = self.write_order()
+        response = self.post(self.payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["id"], order.id)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_order_is_not_written_without_reservation(self):
+        # Бронь сняли, пока заказ ждал записи: ключ мог занять повтор.
+        with self.assertRaises(ValueError):
+            self.write_order()
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_key_is_released_after_validation_error(self):
+        response = self.post({**self.payload, "products": []})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post(self.payload).status_code, 201)
+
+    def test_key_expires_after_ttl(self):
+        first = self.post(self.payload).json()
+        with override_settings(IDEMPOTENCY_KEY_TTL_HOURS=0):
+            second = self.post(self.payload).json()
+        self.assertNotEqual(first["id"], second["id"])
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrdersBatchTest(TestCase):
+    def setUp(self):
+        self.products = generate_dataset(restaurants=1, products=3, orders=0)["products"]
+        self.payload = make_order_payload(self.products)
+
+    def test_valid_orders_are_created_and_invalid_reported_by_index(self):
+        batch = [
+            self.payload,
+            {**self.payload, "phonenumber": "не телефон"},
+            {**self.payload, "products": [{"product": 999999, "quantity": 1}]},
+            {**self.payload, "firstname": "Пётр"},
+        ]
+        response = post_json(Client(), "/api/orders/batch/", batch)
+        self.assertEqual(response.status_code, 201)
+        created = response.json()["created"]
+        errors = response.json()["errors"]
+        self.assertEqual([order["index"] for order in created], [0, 3])
+        self.assertEqual([error["index"] for error in errors], [1, 2])
+        self.assertIn("phonenumber", errors[0]["errors"])
+        self.assertIn("product", errors[1]["errors"]["products"][0])
+        self.assertEqual(
+            sorted(Order.objects.values_list("id", "firstname")),
+            [(created[0]["id"], "Иван"), (created[1]["id"], "Пётр")],
+        )
+
+    def test_batch_without_valid_orders(self):
+        response = post_json(Client(), "/api/orders/batch/", [{**self.payload, "address": ""}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["created"], [])
+        self.assertEqual(response.json()["errors"][0]["index"], 0)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderTotalPriceTest(TestCase):
+    def assert_totals_match_items(self):
+        for order in Order.objects.prefetch_related("items"):
+            with self.subTest(order=order.id):
+                self.assertEqual(
+                    order.total_price,
+                    sum(item.price * item.quantity for item in order.items.all()),
+                )
+
+    def test_total_price_matches_items(self):
+        products = generate_dataset(restaurants=2, products=5, orders=10)["products"]
+        client = Client()
+        payload = make_order_payload(products)
+        payload["products"][0]["quantity"] = 3
+        post_json(client, "/api/order/", payload)
+        with override_settings(ORDER_FAST_PATH_ENABLED=False):
+            post_json(client, "/api/order/", payload)
+        post_json(client, "/api/orders/batch/", [payload] * 2)
+        self.assertEqual(Order.objects.count(), 14)
+        self.assert_totals_match_items()
+
+        order = Order.objects.latest("id")
+        OrderItem.objects.filter(order=order).update(quantity=F("quantity") + 1)
+        with self.assertRaises(CommandError):
+            call_command("update_order_totals", "--verify", stdout=StringIO())
+        call_command("update_order_totals", stdout=StringIO())
+        self.assert_totals_match_items()
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class WithoutCacheTest(TestCase):
+    def test_catalog_and_manager_pages_work_without_versions(self):
+        products = generate_dataset(restaurants=2, products=3, orders=2)["products"]
+        for _ in range(2):
+            catalog = Client().get("/api/products/").json()
+            self.assertEqual(len(catalog), len(products))
+        client = Client()
+        client.force_login(create_manager())
+        self.assertEqual(client.get("/manager/products/").status_code, 200)
+        self.assertEqual(client.get("/manager/orders/").status_code, 200)
+
+
+class OrderChangesTest(TestCase):
+    def test_new_order_is_in_feed_without_settle_delay(self):
+        products = generate_dataset(restaurants=1, products=3, orders=0)["products"]
+        order_id = post_json(Client(), "/api/order/", make_order_payload(products)).json()["id"]
+        client = Client()
+        client.force_login(create_manager())
+        response = client.get("/api/orders/changes/?since=0").json()
+        self.assertEqual([order["id"] for order in response["orders"]], [order_id])
+        after = client.get(f"/api/orders/changes/?since={response['cursor']}").json()
+        self.assertEqual(after["orders"], [])
+
+
+class GroupCommitWriterTest(SimpleTestCase):
+    def make_writer(self):
+        writer = GroupCommitWriter(max_batch_size=10, max_delay=0)
+        writer._ensure_started = lambda: None
+        return writer
+
+    def test_timed_out_order_is_not_written(self):
+        writer = self.make_writer()
+        with self.assertRaises(TimeoutError):
+            writer.write({}, {}, timeout=0.01)
+        # SimpleTestCase не даёт ходить в базу: снятый заказ не должен писаться.
+        writer._flush([writer._queue.get_nowait()])
+
+    def test_order_already_being_written_is_awaited(self):
+        writer = self.make_writer()
+
+        def write_slowly():
+            *_, future = writer._queue.get()
+            future.set_running_or_notify_cancel()
+            time.sleep(0.2)
+            future.set_result("заказ")
+
+        thread = threading.Thread(target=write_slowly)
+        thread.start()
+        with self.assertLogs("foodcartapp.group_commit", "WARNING"):
+            self.assertEqual(writer.write({}, {}, timeout=0.05), "заказ")
+        thread.join()
+
+    def test_wait_for_order_being_written_is_bounded(self):
+        writer = self.make_writer()
+        writer.max_wait = 0.05
+
+        def write_slowly():
+            *_, future = writer._queue.get()
+            future.set_running_or_notify_cancel()
+            time.sleep(0.3)
+            future.set_result("заказ")
+
+        thread = threading.Thread(target=write_slowly)
+        thread.start()
+        with self.assertLogs("foodcartapp.group_commit", "WARNING"), self.assertRaises(TimeoutError):
+            writer.write({}, {}, timeout=0.05)
+        thread.join()
+
+
+class EligibilityIndexTest(TestCase):
+    def setUp(self):
+        self.first = Restaurant.objects.create(name="Первый", address="Москва, Арбат, 1")
+        self.second = Restaurant.objects.create(name="Второй", address="Москва, Арбат, 2")
+        self.product = Product.objects.create(name="Бургер", price=100)
+        cache.clear()
+
+    def change(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        restaurants = get_eligibility_index().find_restaurants([self.product.id])
+        return {restaurant.id for restaurant in restaurants}
+
+    def test_index_follows_menu_and_restaurant_changes(self):
+        self.assertEqual(self.change(lambda: None), set())
+        item = RestaurantMenuItem(restaurant=self.first, product=self.product)
+        self.assertEqual(self.change(item.save), {self.first.id})
+
+        item.availability = False
+        self.assertEqual(self.change(item.save), set())
+        item.availability = True
+        self.assertEqual(self.change(item.save), {self.first.id})
+
+        second_item = RestaurantMenuItem(restaurant=self.second, product=self.product)
+        self.assertEqual(self.change(second_item.save), {self.first.id, self.second.id})
+        self.assertEqual(self.change(item.delete), {self.second.id})
+
+        index = get_eligibility_index()
+        self.assertEqual(self.change(self.first.delete), {self.second.id})
+        self.assertEqual(self.change(self.second.delete), set())
+        # Старый индекс не меняется, пока его могут читать другие потоки.
+        self.assertEqual([r.name for r in index.find_restaurants([self.product.id])], ["Второй"])
+
+        index = get_eligibility_index()
+        self.assertEqual(index.restaurants, [])
+        self.assertEqual(index.full_mask, 0)
+
+
+class RestaurantLocatorTest(TestCase):
+    def test_locator_picks_up_places_geocoded_elsewhere(self):
+        restaurant = Restaurant.objects.create(name="Ресторан", address="Москва, ул. Тверская, 1")
+        cache.clear()
+        locator = get_restaurant_locator()
+        self.assertEqual(locator.unlocated, [restaurant])
+        self.assertIs(get_restaurant_locator(), locator)
+
+        # Воркер геокодирования сохраняет место без смены версии в этом процессе.
+        Place.objects.bulk_create([Place(
+            address=restaurant.address,
+            normalized_address=normalize_address(restaurant.address),
+            latitude=55.76,
+            longitude=37.61,
+        )])
+        locator = get_restaurant_locator()
+        self.assertEqual(locator.unlocated, [])
+        self.assertEqual(
+            [found for found, _ in locator.nearest((55.75, 37.6), restaurant_ids=[restaurant.id])],
+            [restaurant],
+        )
+        self.assertEqual(locator.nearest((55.75, 37.6), restaurant_ids=[]), [])
+
+    @override_settings(MANAGER_NEAREST_RESTAURANTS=1)
+    def test_orders_page_counts_restaurants_beyond_the_nearest(self):
+        generate_dataset(restaurants=3, products=2, orders=6, menu_density=1)
+        cache.clear()
+        client = Client()
+        client.force_login(create_manager())
+        response = client.get("/manager/orders/")
+        orders = [order for order in response.context["order_items"] if not order.restaurant_id]
+        self.assertTrue(orders)
+        for order in orders:
+            self.assertEqual(len(order.available_restaurants), 1)
+            self.assertEqual(order.more_restaurants_count, 2)
+        self.assertContains(response, "и ещё 2 дальше")
+
+
+class GeocodingRescanTest(TestCase):
+    def test_orders_page_does_not_queue_and_rescan_does(self):
+        restaurant = Restaurant.objects.create(name="Ресторан", address="Москва, ул. Тверская, 1")
+        GeocodingJob.objects.all().delete()
+        client = Client()
+        client.force_login(create_manager())
+        client.get("/manager/orders/")
+        self.assertFalse(GeocodingJob.objects.exists())
+
+        self.assertEqual(rescan_geocoding(), 1)
+        self.assertEqual(
+            list(GeocodingJob.objects.values_list("address", flat=True)), [restaurant.address]
+        )
+
+
+@override_settings(PRODUCT_IMAGE_SIZES=[64, 256, 800])
+class ProductImageDerivativesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+
+    def make_image(self, width, height):
+        image = BytesIO()
+        Image.new("RGB", (width, height), "orange").save(image, "JPEG")
+        return SimpleUploadedFile("burger.jpg", image.getvalue(), content_type="image/jpeg")
+
+    def create_product(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Бургер", price=100, description="Описание", image=image
+            )
+        product.refresh_from_db()
+        return product
+
+    def test_derivatives_are_generated_on_save(self):
+        product = self.create_product(self.make_image(1200, 600))
+        variants = product.get_image_variants()
+        self.assertEqual([(variant["width"], variant["height"]) for variant in variants], [
+            (64, 32), (256, 128), (800, 400),
+        ])
+        for variant in variants:
+            self.assertTrue(variant["webp"].endswith(".webp"))
+            self.assertTrue(variant["jpeg"].endswith(".jpeg"))
+        self.assertEqual(product.thumbnail["width"], 64)
+
+    def test_small_image_is_not_upscaled(self):
+        product = self.create_product(self.make_image(200, 100))
+        self.assertEqual(
+            [variant["width"] for variant in product.get_image_variants()], [64, 200]
+        )
@@ -1,8 +1,16 @@
 from django.urls import path
-from .views import product_list_api, banners_list_api, register_order
+from .views import (
+    banners_list_api,
+    order_changes_api,
+    product_list_api,
+    register_order,
+    register_orders_batch,
+)
 
 urlpatterns = [
     path('banners/', banners_list_api, name='banners_list'),
     path('products/', product_list_api, name='product_list'),
     path('order/', register_order, name='register_order'),
+    path('orders/batch/', register_orders_batch, name='register_orders_batch'),
+    path('orders/changes/', order_changes_api, name='order_changes'),
 ]
\ No newline at end of file
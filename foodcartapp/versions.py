@@ -0,0 +1,23 @@
+import time
+
+from django.core.cache import cache
+
+MENU_VERSION_KEY = "foodcartapp:menu_version"
+CATALOG_VERSION_KEY = "foodcartapp:catalog_version"
+LOCATIONS_VERSION_KEY = "foodcartapp:locations_version"
+
+
+def get_version(key):
+    """Текущая версия данных или None, если кэш её не хранит (DummyCache, сбой кэша)."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
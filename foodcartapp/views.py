@@ -1,9 +1,29 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import HttpResponse
 from django.templatetags.static import static
-from .models import Product
-from .serializers import OrderSerializer
+from places.utils import enqueue_geocoding
+from .catalog import get_catalog_snapshot
+from .group_commit import get_order_writer
+from .idempotency import (
+    get_stored_response,
+    hash_request,
+    release_key,
+    reserve_key,
+    store_response,
+)
+from django.conf import settings
+from .models import Order, OrderChange
+from .order_intake import render_order, validate_order_payload
+from .serializers import (
+    OrderChangeSerializer,
+    OrderSerializer,
+    bulk_create_orders,
+    create_orders_batch,
+    validate_orders_batch,
+)
 import logging
 
 
@@ -32,40 +52,134 @@ def banners_list_api(request):
 
 
 @api_view(['GET'])
-def product_list_api(request):  
-    products = Product.objects.select_related('category').available().prefetch_related('menu_items__restaurant')
-    serialized_products = [
-        {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurants': [
-                {
-                    'id': menu_item.restaurant.id,
-                    'name': menu_item.restaurant.name,
-                } for menu_item in product.menu_items.filter(availability=True)
-            ]
-        } for product in products
-    ]
-    return Response(serialized_products)
+@authentication_classes([])
+@permission_classes([])
+def product_list_api(request):
+    return HttpResponse(get_catalog_snapshot(), content_type='application/json')
 
 
 @api_view(['POST'])
 def register_order(request):
-    logger.info(f"Получен запрос на создание заказа: {request.data}")
-    serializer = OrderSerializer(data=request.data)
+    logger.debug("Получен запрос на создание заказа: %s", request.data)
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is None:
+        return create_order(request.data)
+
+    if not 0 < len(idempotency_key) <= 255:
+        return Response(
+            {'non_field_errors': [
+                'Idempotency-Key должен быть непустым и не длиннее 255 символов.'
+            ]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    request_hash = hash_request(request.data)
+    stored = get_stored_response(idempotency_key)
+    if stored is None and not reserve_key(idempotency_key, request_hash):
+        stored = get_stored_response(idempotency_key)
+        if stored is None:
+            return Response(
+                {'non_field_errors': ['Запрос с этим Idempotency-Key ещё обрабатывается.']},
+                status=status.HTTP_409_CONFLICT,
+            )
+    if stored is not None:
+        if stored.request_hash != request_hash:
+            return Response(
+                {'non_field_errors': ['Idempotency-Key уже использован для другого запроса.']},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        logger.info(f"Повтор запроса с Idempotency-Key {idempotency_key}, отдаём сохранённый ответ")
+        return Response(stored.data, status=stored.status_code)
+
+    try:
+        response = create_order(request.data, idempotency_key)
+    except Exception:
+        release_key(idempotency_key)
+        raise
+    if response.status_code == status.HTTP_201_CREATED:
+        store_response(
+            idempotency_key,
+            request_hash,
+            response.status_code,
+            response.data,
+            order_id=response.data['id'],
+        )
+    else:
+        release_key(idempotency_key)
+    return response
+
+
+def create_order(data, idempotency_key=None):
+    """Создаёт заказ; idempotency_key привязывается к заказу в той же транзакции."""
+    order_data = None
+    if settings.ORDER_FAST_PATH_ENABLED:
+        order_data, prices = validate_order_payload(data)
+    if order_data is not None:
+        if settings.ORDER_GROUP_COMMIT_ENABLED:
+            order = get_order_writer().write(
+                order_data, prices, idempotency_key, timeout=settings.ORDER_GROUP_COMMIT_TIMEOUT
+            )
+        else:
+            [order] = bulk_create_orders([order_data], prices, [idempotency_key])
+            enqueue_geocoding([order.address])
+        logger.info(f"Заказ {order.id} успешно создан")
+        return Response(render_order(order, order_data, prices), status=status.HTTP_201_CREATED)
+
+    serializer = OrderSerializer(data=data, context={'idempotency_key': idempotency_key})
     if serializer.is_valid():
         order = serializer.save()
+        if not settings.ORDER_GROUP_COMMIT_ENABLED:
+            enqueue_geocoding([order.address])
         output_serializer = OrderSerializer(order)
         logger.info(f"Заказ успешно создан: {output_serializer.data}")
         return Response(output_serializer.data, status=status.HTTP_201_CREATED)
     logger.error(f"Ошибка валидации заказа: {serializer.errors}")
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+@api_view(['POST'])
+def register_orders_batch(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list) or not orders_data:
+        return Response(
+            {'non_field_errors': ['Ожидается непустой список заказов.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(orders_data) > settings.ORDER_BATCH_MAX_SIZE:
+        return Response(
+            {'non_field_errors': [f'В пакете не больше {settings.ORDER_BATCH_MAX_SIZE} заказов.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    validated_orders, errors, products = validate_orders_batch(orders_data)
+    created = create_orders_batch(validated_orders, products) if validated_orders else []
+    enqueue_geocoding(validated_data['address'] for _, validated_data in validated_orders)
+    logger.info(f"Пакет заказов: создано {len(created)}, с ошибками {len(errors)}")
+    return Response(
+        {'created': created, 'errors': errors},
+        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def order_changes_api(request):
+    since = request.query_params.get('since', '0')
+    limit = request.query_params.get('limit', str(settings.ORDER_CHANGES_PAGE_SIZE))
+    if not since.isdigit() or not limit.isdigit() or int(limit) < 1:
+        return Response(
+            {'non_field_errors': ['since и limit должны быть неотрицательными целыми числами.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    limit = min(int(limit), settings.ORDER_CHANGES_PAGE_SIZE)
+
+    changes, cursor, has_more = OrderChange.objects.collapse_after(int(since), limit)
+    orders = Order.objects.prefetch_related('items').in_bulk(
+        [order_id for order_id, (_, kind) in changes.items() if kind != OrderChange.DELETED]
+    )
+    changed_orders = sorted(orders.values(), key=lambda order: changes[order.id][0])
+    return Response({
+        'cursor': cursor,
+        'has_more': has_more,
+        'orders': OrderChangeSerializer(changed_orders, many=True).data,
+        'deleted': [order_id for order_id in changes if order_id not in orders],
+    })
@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import GeocodingJob, Place
+
+
+@admin.register(GeocodingJob)
+class GeocodingJobAdmin(admin.ModelAdmin):
+    list_display = ['address', 'created_at', 'attempts', 'retry_at']
+    search_fields = ['address']
+
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ['address', 'latitude', 'longitude', 'status', 'attempts', 'last_updated']
+    list_filter = ['status']
+    search_fields = ['address']
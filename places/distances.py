@@ -0,0 +1,44 @@
+import numpy as np
+from geopy.distance import geodesic
+
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def to_radians(coords):
+    points = np.array(
+        [coord if coord and None not in coord else (np.nan, np.nan) for coord in coords],
+        dtype=float,
+    ).reshape(-1, 2)
+    return np.radians(points)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distance_matrix(origins, destinations):
+    """Расстояния в метрах по формуле гаверсинусов: строки — origins, столбцы — destinations.
+
+    Точки без координат дают NaN во всей строке или столбце.
+    """
+    origins = to_radians(origins)
+    destinations = to_radians(destinations)
+    return haversine(
+        origins[:, 0:1], origins[:, 1:2], destinations[:, 0], destinations[:, 1]
+    )
+
+
+def refine_nearest(origin, destinations, distances, top_k):
+    """Пересчитывает по геодезической k ближайших из distances, остальные не трогает."""
+    distances = np.array(distances, dtype=float)
+    if not top_k:
+        return distances
+    for index in np.argsort(distances)[:top_k]:
+        if np.isnan(distances[index]):
+            break
+        distances[index] = geodesic(origin, destinations[index]).meters
+    return distances
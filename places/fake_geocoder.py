@@ -0,0 +1,60 @@
+import json
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_fake_coordinates(address):
+    checksum = zlib.crc32(address.encode())
+    lat = 55.55 + (checksum % 10000) / 25000
+    lon = 37.35 + (checksum // 10000 % 10000) / 17000
+    return lat, lon
+
+
+def make_handler(latency):
+    class FakeGeocoderHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            address = query.get("geocode", [""])[0]
+            time.sleep(latency)
+            lat, lon = make_fake_coordinates(address)
+            payload = {
+                "response": {
+                    "GeoObjectCollection": {
+                        "featureMember": [
+                            {
+                                "GeoObject": {
+                                    "metaDataProperty": {
+                                        "GeocoderMetaData": {
+                                            "kind": "house",
+                                            "precision": "exact",
+                                            "text": f"Россия, {address}",
+                                        }
+                                    },
+                                    "Point": {"pos": f"{lon} {lat}"},
+                                }
+                            }
+                        ]
+                    }
+                }
+            }
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeGeocoderHandler
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.05):
+    server = ThreadingHTTPServer((host, port), make_handler(latency))
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,236 @@
+import csv
+import logging
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .fake_geocoder import make_fake_coordinates
+from .models import Place
+from .normalization import normalize_address
+
+logger = logging.getLogger(__name__)
+
+
+VALID_ADDRESS_KINDS = {"house", "street", "locality"}
+
+GeocodingResult = namedtuple("GeocodingResult", ["lat", "lon", "status"])
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_coordinates(session, base_url, apikey, address):
+    logger.info(f"Геокодирование адреса: {address}")
+    params = {
+        "apikey": apikey,
+        "geocode": address,
+        "format": "json",
+    }
+    try:
+        response = session.get(base_url, params=params, timeout=settings.GEOCODER_TIMEOUT)
+        if response.status_code in (403, 429):
+            logger.error(f"Ошибка {response.status_code} для {address}")
+            return GeocodingResult(None, None, Place.RATE_LIMITED)
+        response.raise_for_status()
+        payload = response.json()
+        found_places = payload.get("response", {}).get(
+            "GeoObjectCollection", {}
+        ).get("featureMember")
+        if not found_places:
+            logger.info(f"Адрес {address} не найден")
+            return GeocodingResult(None, None, Place.NOT_FOUND)
+        feature = found_places[0].get("GeoObject", {})
+        kind = feature.get("metaDataProperty", {}).get(
+            "GeocoderMetaData", {}
+        ).get("kind", "")
+        precision = feature.get("metaDataProperty", {}).get(
+            "GeocoderMetaData", {}
+        ).get("precision", "")
+        address_text = feature.get("metaDataProperty", {}).get(
+            "GeocoderMetaData", {}
+        ).get("text", "")
+        point = feature.get("Point", {}).get("pos", "")
+        if point and kind in VALID_ADDRESS_KINDS and address.lower() in address_text.lower():
+            lon, lat = map(float, point.split())
+            if precision != "exact" and kind == "locality":
+                logger.info(
+                    f"Адрес {address} определён как город, используются примерные координаты"
+                )
+            logger.debug(
+                f"Успешное геокодирование: {address}, kind: {kind}, "
+                f"precision: {precision}, coords: ({lat}, {lon})"
+            )
+            return GeocodingResult(lat, lon, Place.OK)
+        logger.info(
+            f"Адрес {address} невалиден (kind: {kind}, text: {address_text})"
+        )
+        return GeocodingResult(None, None, Place.REJECTED_KIND)
+    except requests.RequestException as e:
+        logger.error(f"Ошибка запроса для {address}: {str(e)}")
+        return GeocodingResult(None, None, Place.ERROR)
+    except (KeyError, ValueError) as e:
+        logger.error(f"Ошибка обработки для {address}: {str(e)}")
+        return GeocodingResult(None, None, Place.ERROR)
+
+
+class BaseGeocoder:
+    def geocode_many(self, addresses):
+        """Возвращает словарь {адрес: GeocodingResult}.
+
+        Адреса, которых нет в ответе, геокодер не обработал — их можно
+        передать следующему геокодеру и не нужно сохранять в Place.
+        """
+        raise NotImplementedError
+
+
+class YandexGeocoder(BaseGeocoder):
+    def __init__(self, apikey=None, base_url=None, concurrency=None, rate_limit=None):
+        self.apikey = apikey or settings.YANDEX_GEOCODER_API_KEY
+        self.base_url = base_url or settings.GEOCODER_URL
+        self.concurrency = concurrency or settings.GEOCODER_CONCURRENCY
+        self.rate_limit = settings.GEOCODER_RATE_LIMIT if rate_limit is None else rate_limit
+
+    def geocode_many(self, addresses):
+        if not self.apikey:
+            logger.error("Отсутствует YANDEX_GEOCODER_API_KEY")
+            return {}
+        bucket = TokenBucket(self.rate_limit)
+
+        with create_session(self.concurrency) as session:
+            def fetch(address):
+                bucket.acquire()
+                return fetch_coordinates(session, self.base_url, self.apikey, address)
+
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                return dict(zip(addresses, executor.map(fetch, addresses)))
+
+
+def make_gazetteer_key(address):
+    return normalize_address(address)
+
+
+class GazetteerGeocoder(BaseGeocoder):
+    """Справочник известных адресов из CSV (address,latitude,longitude) или SQLite.
+
+    В SQLite ожидается таблица gazetteer(address TEXT PRIMARY KEY, latitude REAL,
+    longitude REAL), где address уже приведён к виду make_gazetteer_key, то есть
+    к normalize_address: «ул. Тверская, 1» и «Тверская улица 1» — один ключ.
+    """
+
+    SQLITE_CHUNK_SIZE = 500
+
+    def __init__(self, path=None):
+        self.path = path or settings.GEOCODER_GAZETTEER_PATH
+        self.coords = None
+
+    def load_csv(self):
+        with open(self.path, newline="", encoding="utf-8") as csv_file:
+            return {
+                make_gazetteer_key(row["address"]): (float(row["latitude"]), float(row["longitude"]))
+                for row in csv.DictReader(csv_file)
+            }
+
+    def lookup_sqlite(self, keys):
+        found = {}
+        with sqlite3.connect(f"file:{self.path}?mode=ro", uri=True) as database:
+            for start in range(0, len(keys), self.SQLITE_CHUNK_SIZE):
+                chunk = keys[start:start + self.SQLITE_CHUNK_SIZE]
+                rows = database.execute(
+                    "SELECT address, latitude, longitude FROM gazetteer "
+                    f"WHERE address IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update((address, (lat, lon)) for address, lat, lon in rows)
+        return found
+
+    def geocode_many(self, addresses):
+        if not self.path:
+            return {}
+        keys = {address: make_gazetteer_key(address) for address in addresses}
+        if self.path.endswith(".csv"):
+            if self.coords is None:
+                self.coords = self.load_csv()
+            found = self.coords
+        else:
+            found = self.lookup_sqlite(list(set(keys.values())))
+        results = {}
+        for address, key in keys.items():
+            if key in found:
+                lat, lon = found[key]
+                results[address] = GeocodingResult(lat, lon, Place.OK)
+            else:
+                results[address] = GeocodingResult(None, None, Place.NOT_FOUND)
+        return results
+
+
+class FakeGeocoder(BaseGeocoder):
+    """Детерминированные координаты в пределах Москвы — для тестов и бенчмарков."""
+
+    def geocode_many(self, addresses):
+        return {
+            address: GeocodingResult(*make_fake_coordinates(address), Place.OK)
+            for address in addresses
+        }
+
+
+_geocoders = {}
+
+
+def get_geocoders():
+    paths = tuple(settings.GEOCODER_BACKENDS)
+    if paths not in _geocoders:
+        _geocoders[paths] = [import_string(path)() for path in paths]
+    return _geocoders[paths]
+
+
+def geocode_many(addresses):
+    """Прогоняет адреса по цепочке GEOCODER_BACKENDS: каждому следующему достаются
+    адреса, которые предыдущие не нашли."""
+    results = {}
+    remaining = list(addresses)
+    for geocoder in get_geocoders():
+        if not remaining:
+            break
+        found = geocoder.geocode_many(remaining)
+        results.update(found)
+        remaining = [
+            address for address in remaining
+            if address not in found or found[address].status != Place.OK
+        ]
+    return results
@@ -0,0 +1,48 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from geopy.distance import geodesic
+
+from places.distances import distance_matrix
+
+
+def random_point(rng):
+    return rng.uniform(55.55, 55.95), rng.uniform(37.35, 37.85)
+
+
+class Command(BaseCommand):
+    help = "Сравнивает точность и скорость матрицы гаверсинусов с попарным geodesic"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1000)
+        parser.add_argument("--restaurants", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        orders = [random_point(rng) for _ in range(options["orders"])]
+        restaurants = [random_point(rng) for _ in range(options["restaurants"])]
+
+        started_at = time.perf_counter()
+        exact = np.array(
+            [[geodesic(order, restaurant).meters for restaurant in restaurants] for order in orders]
+        )
+        geodesic_time = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        approximate = distance_matrix(orders, restaurants)
+        haversine_time = time.perf_counter() - started_at
+
+        errors = np.abs(approximate - exact)
+        relative_errors = errors / np.maximum(exact, 1)
+        same_nearest = np.mean(approximate.argmin(axis=1) == exact.argmin(axis=1))
+        self.stdout.write(f"{options['orders']} заказов × {options['restaurants']} ресторанов")
+        self.stdout.write(f"geodesic попарно: {geodesic_time:.3f} с")
+        self.stdout.write(f"Матрица гаверсинусов: {haversine_time:.4f} с")
+        self.stdout.write(f"Ускорение: ×{geodesic_time / haversine_time:.0f}")
+        self.stdout.write(
+            f"Ошибка: макс. {errors.max():.1f} м, макс. относительная {relative_errors.max():.3%}, "
+            f"совпадение ближайшего ресторана {same_nearest:.2%}"
+        )
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from places.fake_geocoder import make_server
+from places.geocoders import YandexGeocoder
+
+
+class Command(BaseCommand):
+    help = "Сравнивает последовательное и параллельное геокодирование на локальной заглушке"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--addresses", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки, с")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--rate-limit", type=float, default=50, help="запросов в секунду")
+
+    def handle(self, *args, **options):
+        server = make_server(latency=options["latency"])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        base_url = f"http://{host}:{port}/1.x/"
+        addresses = [f"Москва, ул. Тестовая, {number}" for number in range(options["addresses"])]
+
+        try:
+            for title, concurrency in (("Последовательно", 1), ("Параллельно", options["concurrency"])):
+                started_at = time.perf_counter()
+                geocoder = YandexGeocoder(
+                    apikey="fake",
+                    base_url=base_url,
+                    concurrency=concurrency,
+                    rate_limit=options["rate_limit"],
+                )
+                coords = geocoder.geocode_many(addresses)
+                elapsed = time.perf_counter() - started_at
+                found = sum(result.lat is not None for result in coords.values())
+                self.stdout.write(
+                    f"{title} ({concurrency} потоков): {elapsed:.2f} с, "
+                    f"{len(addresses) / elapsed:.1f} адресов/с, найдено {found}"
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
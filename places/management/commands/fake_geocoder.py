@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from places.fake_geocoder import make_server
+
+
+class Command(BaseCommand):
+    help = "Запускает локальную заглушку геокодера Яндекса для нагрузочных тестов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа, с")
+
+    def handle(self, *args, **options):
+        server = make_server(options["host"], options["port"], options["latency"])
+        host, port = server.server_address
+        self.stdout.write(f"Заглушка геокодера: http://{host}:{port}/1.x/ (GEOCODER_URL)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
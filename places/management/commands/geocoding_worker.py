@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from places.utils import process_geocoding_jobs, rescan_geocoding
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Разбирает очередь адресов на геокодирование и сохраняет координаты в Place"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--interval", type=float, default=1, help="пауза при пустой очереди, с")
+        parser.add_argument("--once", action="store_true", help="разобрать очередь и выйти")
+        parser.add_argument(
+            "--rescan-interval", type=float, default=300,
+            help="как часто искать адреса без координат, с; 0 — не искать",
+        )
+
+    def handle(self, *args, **options):
+        rescanned_at = None
+        while True:
+            try:
+                if options["rescan_interval"] and (
+                    rescanned_at is None
+                    or time.monotonic() - rescanned_at >= options["rescan_interval"]
+                ):
+                    rescanned_at = time.monotonic()
+                    if queued := rescan_geocoding():
+                        self.stdout.write(f"Поставлено в очередь адресов без координат: {queued}")
+                processed = process_geocoding_jobs(options["batch_size"])
+            except Exception:
+                # Например, база недоступна: ждём и пробуем снова, а не падаем.
+                logger.exception("Ошибка при разборе очереди геокодирования")
+                close_old_connections()
+                processed = 0
+            if processed:
+                self.stdout.write(f"Обработано адресов: {processed}")
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from places.models import Place
+from places.normalization import normalize_address
+
+
+def rank_place(place):
+    """Какое из мест с одним ключом оставить: найденное, затем более свежее."""
+    return (place.status == Place.OK, place.last_updated is not None, place.last_updated)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает normalized_address у всех мест по текущим правилам и ADDRESS_CITIES, "
+        "места с совпавшими ключами сливает в одно, места с пустым ключом удаляет"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="только посчитать изменения")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            kept = {}
+            removed = []
+            for place in Place.objects.order_by("id"):
+                key = normalize_address(place.address)
+                current = kept.get(key)
+                if not key:
+                    removed.append(place)
+                elif current is None:
+                    kept[key] = place
+                elif rank_place(place) > rank_place(current):
+                    kept[key] = place
+                    removed.append(current)
+                else:
+                    removed.append(place)
+            changed = [place for key, place in kept.items() if place.normalized_address != key]
+            self.stdout.write(
+                f"Ключ меняется у {len(changed)} мест, "
+                f"удаляются или сливаются в другие {len(removed)} мест"
+            )
+            if options["dry_run"] or not (changed or removed):
+                return
+
+            Place.objects.filter(pk__in=[place.pk for place in removed]).delete()
+            # Ключи уникальны, а новые ключи одних мест могут совпадать со старыми
+            # ключами других, поэтому сначала ставятся временные ключи.
+            for place in changed:
+                place.normalized_address = f"#{place.pk}"
+            Place.objects.bulk_update(changed, ["normalized_address"], batch_size=500)
+            for key, place in kept.items():
+                place.normalized_address = key
+            Place.objects.bulk_update(changed, ["normalized_address"], batch_size=500)
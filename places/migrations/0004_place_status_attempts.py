@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0003_geocodingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Неудачных попыток подряд'),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='status',
+            field=models.CharField(choices=[('OK', 'Найден'), ('NOT_FOUND', 'Не найден'), ('REJECTED_KIND', 'Неподходящий тип объекта'), ('RATE_LIMITED', 'Превышен лимит запросов'), ('ERROR', 'Ошибка запроса')], default='OK', max_length=20, verbose_name='Результат геокодирования'),
+        ),
+    ]
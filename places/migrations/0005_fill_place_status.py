@@ -0,0 +1,19 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def fill_place_status(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+    Place.objects.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True)).update(
+        status='ERROR', attempts=1
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('places', '0004_place_status_attempts'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_place_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0005_fill_place_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(editable=False, max_length=200, null=True, verbose_name='Нормализованный адрес'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+import re
+
+from django.db import migrations
+
+# Копия places.normalization на момент миграции: правила и ADDRESS_CITIES
+# потом могут поменяться, а миграция должна давать те же ключи. Пересчитать
+# ключи под новые правила — python manage.py renormalize_places.
+CITIES = {'москва'}
+
+DROPPED_TOKENS = {'ул', 'улица', 'д', 'дом', 'г', 'город', 'россия', 'рф'}
+
+EXPANDED_TOKENS = {
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пр-кт': 'проспект',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'бульв': 'бульвар',
+    'пер': 'переулок',
+    'ш': 'шоссе',
+    'пр-д': 'проезд',
+    'туп': 'тупик',
+    'мкр': 'микрорайон',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'с': 'строение',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+TOKEN_PATTERN = re.compile(r'[0-9a-zа-я]+(?:-[0-9a-zа-я]+)*')
+HOUSE_PATTERN = re.compile(r'\b(\d+)(к|корп|с|стр)(\d+)\b')
+
+
+def normalize_address(address):
+    address = HOUSE_PATTERN.sub(r'\1 \2 \3', address.lower().replace('ё', 'е'))
+    tokens = [
+        EXPANDED_TOKENS.get(token, token)
+        for token in TOKEN_PATTERN.findall(address)
+        if token not in DROPPED_TOKENS
+    ]
+    cities = [token for token in tokens if token in CITIES]
+    others = [token for token in tokens if token not in CITIES]
+    return ' '.join(cities + others)
+
+
+def fill_normalized_address(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+    kept = {}
+    duplicates = []
+    for place in Place.objects.order_by('id'):
+        place.normalized_address = normalize_address(place.address)
+        current = kept.get(place.normalized_address)
+        if current is None:
+            kept[place.normalized_address] = place
+            continue
+        place_rank = (place.status == 'OK', place.last_updated is not None, place.last_updated)
+        current_rank = (current.status == 'OK', current.last_updated is not None, current.last_updated)
+        if place_rank > current_rank:
+            kept[place.normalized_address] = place
+            duplicates.append(current)
+        else:
+            duplicates.append(place)
+    Place.objects.filter(pk__in=[place.pk for place in duplicates]).delete()
+    Place.objects.bulk_update(kept.values(), ['normalized_address'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('places', '0006_place_normalized_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_normalized_address, migrations.RunPython.noop),
+    ]
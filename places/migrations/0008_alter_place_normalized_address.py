@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0007_fill_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(editable=False, max_length=200, unique=True, verbose_name='Нормализованный адрес'),
+        ),
+    ]
@@ -1,12 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .normalization import MAX_KEY_LENGTH
 
 
 class Place(models.Model):
+    OK = 'OK'
+    NOT_FOUND = 'NOT_FOUND'
+    REJECTED_KIND = 'REJECTED_KIND'
+    RATE_LIMITED = 'RATE_LIMITED'
+    ERROR = 'ERROR'
+    STATUS_CHOICES = [
+        (OK, 'Найден'),
+        (NOT_FOUND, 'Не найден'),
+        (REJECTED_KIND, 'Неподходящий тип объекта'),
+        (RATE_LIMITED, 'Превышен лимит запросов'),
+        (ERROR, 'Ошибка запроса'),
+    ]
+
     address = models.CharField(
         verbose_name='Адрес',
         max_length=200,
         unique=True
     )
+    normalized_address = models.CharField(
+        verbose_name='Нормализованный адрес',
+        max_length=MAX_KEY_LENGTH,
+        unique=True,
+        editable=False
+    )
     latitude = models.FloatField(
         verbose_name='Широта',
         null=True,
@@ -22,10 +47,64 @@ class Place(models.Model):
         null=True,
         blank=True
     )
+    status = models.CharField(
+        verbose_name='Результат геокодирования',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=OK
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Неудачных попыток подряд',
+        default=0
+    )
 
     class Meta:
         verbose_name = 'Место'
         verbose_name_plural = 'Места'
 
     def __str__(self):
-        return self.address
\ No newline at end of file
+        return self.address
+
+    def get_retry_at(self):
+        backoff = min(
+            settings.GEOCODER_RETRY_BACKOFF * 2 ** max(self.attempts - 1, 0),
+            settings.GEOCODER_RETRY_BACKOFF_MAX,
+        )
+        return self.last_updated + timedelta(seconds=backoff)
+
+    def is_retry_due(self, now=None):
+        if self.status == self.OK:
+            return False
+        if not self.last_updated:
+            return True
+        return (now or timezone.now()) >= self.get_retry_at()
+
+
+class GeocodingJob(models.Model):
+    address = models.CharField(
+        verbose_name='Адрес',
+        max_length=200,
+        unique=True
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата постановки в очередь',
+        auto_now_add=True
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name='Неудачных попыток',
+        default=0
+    )
+    retry_at = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Задача геокодирования'
+        verbose_name_plural = 'Задачи геокодирования'
+        ordering = ['id']
+
+    def __str__(self):
+        return self.address
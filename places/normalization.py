@@ -0,0 +1,57 @@
+import hashlib
+import re
+
+from django.conf import settings
+
+# Длина поля Place.normalized_address.
+MAX_KEY_LENGTH = 200
+
+DROPPED_TOKENS = {"ул", "улица", "д", "дом", "г", "город", "россия", "рф"}
+
+EXPANDED_TOKENS = {
+    "пр-т": "проспект",
+    "просп": "проспект",
+    "пр-кт": "проспект",
+    "пл": "площадь",
+    "наб": "набережная",
+    "б-р": "бульвар",
+    "бул": "бульвар",
+    "бульв": "бульвар",
+    "пер": "переулок",
+    "ш": "шоссе",
+    "пр-д": "проезд",
+    "туп": "тупик",
+    "мкр": "микрорайон",
+    "к": "корпус",
+    "корп": "корпус",
+    "с": "строение",
+    "стр": "строение",
+    "кв": "квартира",
+}
+
+TOKEN_PATTERN = re.compile(r"[0-9a-zа-я]+(?:-[0-9a-zа-я]+)*")
+HOUSE_PATTERN = re.compile(r"\b(\d+)(к|корп|с|стр)(\d+)\b")
+
+
+def normalize_address(address):
+    """Приводит адрес к ключу для поиска в Place.
+
+    «Москва, ул. Новый Арбат, 15», «москва новый арбат 15» и «Новый Арбат ул., д. 15,
+    Москва» дают один и тот же ключ «москва новый арбат 15». Ключ длиннее
+    MAX_KEY_LENGTH укорачивается, и в конец ставится хэш полного ключа. Адрес
+    без значимых слов даёт пустой ключ: такие адреса не ищутся и не сохраняются.
+    """
+    address = HOUSE_PATTERN.sub(r"\1 \2 \3", address.lower().replace("ё", "е"))
+    tokens = TOKEN_PATTERN.findall(address)
+    tokens = [
+        EXPANDED_TOKENS.get(token, token)
+        for token in tokens
+        if token not in DROPPED_TOKENS
+    ]
+    cities = [token for token in tokens if token in settings.ADDRESS_CITIES]
+    others = [token for token in tokens if token not in settings.ADDRESS_CITIES]
+    key = " ".join(cities + others)
+    if len(key) > MAX_KEY_LENGTH:
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        key = f"{key[:MAX_KEY_LENGTH - len(digest) - 1]} {digest}"
+    return key
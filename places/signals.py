@@ -0,0 +1,19 @@
+from django.db.models.signals import pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Place
+from .normalization import normalize_address
+
+places_geocoded = Signal()
+
+# Приёмники возвращают адреса, у которых должны быть координаты: воркер
+# геокодирования ставит в очередь те из них, что ещё не найдены.
+geocoding_rescan = Signal()
+
+
+@receiver(pre_save, sender=Place)
+def fill_normalized_address(sender, instance, **kwargs):
+    # pre_save приходит и при loaddata, в отличие от переопределённого save().
+    instance.normalized_address = normalize_address(instance.address)
+    if not instance.normalized_address:
+        raise ValueError(f"В адресе {instance.address!r} нет слов, по которым его можно искать")
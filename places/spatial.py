@@ -0,0 +1,95 @@
+import heapq
+import math
+from collections import defaultdict
+
+from .distances import EARTH_RADIUS_METERS
+
+KM_PER_DEGREE = 111.195
+
+
+class GridIndex:
+    """Равномерная сетка над точками (key, lat, lon) для поиска ближайших.
+
+    Ширина ячейки по долготе подобрана по самой северной точке, поэтому
+    в пределах данных любая ячейка не уже cell_size_km по обеим осям.
+    """
+
+    def __init__(self, points, cell_size_km=2):
+        self.cell_size_km = cell_size_km
+        self.lat_step = cell_size_km / KM_PER_DEGREE
+        max_abs_lat = max((abs(lat) for _, lat, _ in points), default=0)
+        self.lon_step = self.lat_step / max(math.cos(math.radians(max_abs_lat)), 0.01)
+
+        cells = defaultdict(list)
+        self.points = {}
+        for key, lat, lon in points:
+            point = (key, math.radians(lat), math.radians(lon), math.cos(math.radians(lat)))
+            cells[self.get_cell(lat, lon)].append(point)
+            self.points[key] = point
+        self.cells = dict(cells)
+        self.size = len(points)
+        if cells:
+            rows, columns = zip(*cells)
+            self.bounds = (min(rows), max(rows), min(columns), max(columns))
+
+    def __len__(self):
+        return self.size
+
+    def get_cell(self, lat, lon):
+        return math.floor(lat / self.lat_step), math.floor(lon / self.lon_step)
+
+    def iter_ring(self, row, column, radius):
+        if radius == 0:
+            yield row, column
+            return
+        for offset in range(-radius, radius + 1):
+            yield row - radius, column + offset
+            yield row + radius, column + offset
+        for offset in range(-radius + 1, radius):
+            yield row + offset, column - radius
+            yield row + offset, column + radius
+
+    def measure(self, lat, lon, points, predicate=None):
+        lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+        cos_lat = math.cos(lat_rad)
+        for key, point_lat, point_lon, point_cos_lat in points:
+            if predicate is not None and not predicate(key):
+                continue
+            a = (
+                math.sin((point_lat - lat_rad) / 2) ** 2
+                + cos_lat * point_cos_lat * math.sin((point_lon - lon_rad) / 2) ** 2
+            )
+            yield 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(a, 1))), key
+
+    def scan_cells(self, lat, lon, cells, predicate=None):
+        for cell in cells:
+            yield from self.measure(lat, lon, self.cells.get(cell, ()), predicate)
+
+    def max_radius(self, row, column):
+        min_row, max_row, min_column, max_column = self.bounds
+        return max(
+            abs(row - min_row), abs(row - max_row),
+            abs(column - min_column), abs(column - max_column),
+        )
+
+    def nearest(self, lat, lon, k=1, predicate=None):
+        """k ближайших точек как список (расстояние в метрах, key) по возрастанию."""
+        if not self.size or k <= 0:
+            return []
+        row, column = self.get_cell(lat, lon)
+        best = []
+        for radius in range(self.max_radius(row, column) + 1):
+            ring = self.iter_ring(row, column, radius)
+            for distance, key in self.scan_cells(lat, lon, ring, predicate):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, key))
+            if len(best) == k and -best[0][0] <= radius * self.cell_size_km * 1000:
+                break
+        return sorted((-distance, key) for distance, key in best)
+
+    def nearest_among(self, lat, lon, keys, k=1):
+        """k ближайших точек из keys перебором, без обхода сетки."""
+        points = [self.points[key] for key in keys if key in self.points]
+        return heapq.nsmallest(k, self.measure(lat, lon, points))
@@ -1,3 +1,160 @@
-from django.test import TestCase
+import io
+import random
 
-# Create your tests here.
+from django.core import serializers
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .distances import distance_matrix
+from .geocoders import FakeGeocoder
+from .models import GeocodingJob, Place
+from .normalization import MAX_KEY_LENGTH, normalize_address
+from .spatial import GridIndex
+from .utils import enqueue_geocoding, geocode_addresses, get_places, process_geocoding_jobs
+
+
+class FailingGeocoder(FakeGeocoder):
+    def geocode_many(self, addresses):
+        if any("сбой" in address for address in addresses):
+            raise ValueError("неожиданный ответ геокодера")
+        return super().geocode_many(addresses)
+
+
+class GridIndexTest(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(20251018)
+        self.points = [
+            (key, 55.75 + generator.uniform(-0.3, 0.3), 37.62 + generator.uniform(-0.5, 0.5))
+            for key in range(300)
+        ]
+        self.origins = [
+            (55.75 + generator.uniform(-0.5, 0.5), 37.62 + generator.uniform(-0.8, 0.8))
+            for _ in range(50)
+        ]
+        self.keys = [
+            set(generator.sample(range(300), size)) for size in (0, 1, 3, 40, 300)
+        ]
+        self.index = GridIndex(self.points, cell_size_km=2)
+
+    def brute_force(self, lat, lon, k, keys=None):
+        points = [point for point in self.points if keys is None or point[0] in keys]
+        if not points:
+            return []
+        [distances] = distance_matrix(
+            [(lat, lon)], [(point_lat, point_lon) for _, point_lat, point_lon in points]
+        )
+        return sorted(zip(distances.tolist(), [key for key, _, _ in points]))[:k]
+
+    def assert_same(self, found, expected):
+        self.assertEqual([key for _, key in found], [key for _, key in expected])
+        for (distance, _), (expected_distance, _) in zip(found, expected):
+            self.assertAlmostEqual(distance, expected_distance, delta=1e-3)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in self.origins:
+            for k in (1, 5, 20):
+                with self.subTest(lat=lat, lon=lon, k=k):
+                    self.assert_same(self.index.nearest(lat, lon, k), self.brute_force(lat, lon, k))
+
+    def test_nearest_with_keys_matches_brute_force(self):
+        for lat, lon in self.origins:
+            for keys in self.keys:
+                for k in (1, 5):
+                    with self.subTest(lat=lat, lon=lon, keys=len(keys), k=k):
+                        expected = self.brute_force(lat, lon, k, keys)
+                        self.assert_same(self.index.nearest(lat, lon, k, keys.__contains__), expected)
+                        self.assert_same(self.index.nearest_among(lat, lon, keys, k), expected)
+
+
+@override_settings(GEOCODER_BACKENDS=["places.geocoders.FakeGeocoder"])
+class NormalizedAddressTest(TestCase):
+    def test_raw_save_fills_normalized_address(self):
+        data = serializers.serialize("json", [
+            Place(pk=1, address="Москва, ул. Тверская, 1", latitude=55.76, longitude=37.61),
+            Place(pk=2, address="Москва, ул. Арбат, 2", latitude=55.75, longitude=37.59),
+        ])
+        for deserialized in serializers.deserialize("json", data):
+            deserialized.save()
+        self.assertEqual(
+            sorted(Place.objects.values_list("normalized_address", flat=True)),
+            ["москва арбат 2", "москва тверская 1"],
+        )
+
+    def test_geocoding_replaces_place_stored_under_old_key(self):
+        Place.objects.bulk_create([
+            Place(address=address, normalized_address=key, status=Place.ERROR)
+            for address, key in [
+                ("Тверская 1, Москва", "тверская 1 москва"),
+                ("Арбат 2, Москва", "арбат 2 москва"),
+                ("Москва, Арбат, 2", "москва арбат 2"),
+            ]
+        ])
+        results = geocode_addresses(["Тверская 1, Москва", "Арбат 2, Москва"])
+        self.assertNotIn((None, None), results.values())
+        self.assertEqual(
+            sorted(Place.objects.values_list("normalized_address", "status")),
+            [("москва арбат 2", Place.OK), ("москва тверская 1", Place.OK)],
+        )
+
+    def test_long_addresses_get_distinct_keys_that_fit_the_field(self):
+        # Сокращения раскрываются, поэтому ключ бывает длиннее самого адреса.
+        addresses = [f"Москва, {'пр-т 5к1 ' * 20}{house}" for house in (1, 2)]
+        self.assertTrue(all(len(address) <= 200 for address in addresses))
+        keys = [normalize_address(address) for address in addresses]
+        self.assertTrue(all(len(key) == MAX_KEY_LENGTH for key in keys))
+        self.assertNotEqual(keys[0], keys[1])
+        geocode_addresses(addresses)
+        self.assertEqual(set(get_places(addresses)), set(addresses))
+
+    def test_addresses_without_key_are_skipped(self):
+        addresses = ["ул., д.", "—"]
+        self.assertEqual(geocode_addresses(addresses), dict.fromkeys(addresses, (None, None)))
+        enqueue_geocoding(addresses)
+        self.assertEqual(get_places(addresses), {})
+        self.assertFalse(Place.objects.exists())
+        self.assertFalse(GeocodingJob.objects.exists())
+        with self.assertRaises(ValueError):
+            Place.objects.create(address="ул., д.")
+
+    def test_renormalize_merges_places_with_same_key(self):
+        Place.objects.bulk_create([
+            Place(address="Москва, Тверская, 1", normalized_address="a", status=Place.ERROR),
+            Place(
+                address="Тверская улица 1, Москва", normalized_address="b",
+                latitude=55.76, longitude=37.61,
+            ),
+            Place(address="Москва, Арбат, 2", normalized_address="москва тверская 1"),
+        ])
+        call_command("renormalize_places", stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Place.objects.values_list("address", "normalized_address")),
+            [
+                ("Москва, Арбат, 2", "москва арбат 2"),
+                ("Тверская улица 1, Москва", "москва тверская 1"),
+            ],
+        )
+        address = "ул. Тверская, д. 1, Москва"
+        self.assertEqual(get_places([address])[address].latitude, 55.76)
+
+
+@override_settings(
+    GEOCODER_BACKENDS=["places.tests.FailingGeocoder"],
+    GEOCODING_JOB_RETRY_BACKOFF=60,
+    GEOCODING_JOB_MAX_ATTEMPTS=2,
+)
+class GeocodingJobTest(TestCase):
+    def test_failing_address_is_postponed_and_then_dropped(self):
+        enqueue_geocoding(["Москва, Арбат, 1", "Москва, сбой, 2", "Москва, Арбат, 3"])
+        with self.assertLogs("places.utils", "ERROR"):
+            self.assertEqual(process_geocoding_jobs(10), 3)
+        self.assertEqual(Place.objects.count(), 2)
+        job = GeocodingJob.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.retry_at)
+
+        self.assertEqual(process_geocoding_jobs(10), 0)
+        GeocodingJob.objects.update(retry_at=None)
+        with self.assertLogs("places.utils", "ERROR") as logs:
+            self.assertEqual(process_geocoding_jobs(10), 1)
+        self.assertIn("снят с очереди", logs.output[-1])
+        self.assertFalse(GeocodingJob.objects.exists())
@@ -1,101 +1,197 @@
 import logging
-import time
+from datetime import timedelta
 
-import requests
 from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 
-from .models import Place
+from .geocoders import geocode_many
+from .models import GeocodingJob, Place
+from .normalization import normalize_address
+from .signals import geocoding_rescan, places_geocoded
 
 logger = logging.getLogger(__name__)
 
 
-VALID_ADDRESS_KINDS = {"house", "street", "locality"}
+def get_places(addresses):
+    """Находит места по адресам с учётом нормализации: {исходный адрес: Place}.
 
+    Адреса с пустым ключом не ищутся: мест с таким ключом не бывает.
+    """
+    normalized = {
+        address: key for address in addresses if (key := normalize_address(address))
+    }
+    places = {
+        place.normalized_address: place
+        for place in Place.objects.filter(normalized_address__in=set(normalized.values()))
+    }
+    return {
+        address: places[key] for address, key in normalized.items() if key in places
+    }
 
-def geocode_addresses(addresses):
-    if not settings.YANDEX_GEOCODER_API_KEY:
-        logger.error("Отсутствует YANDEX_GEOCODER_API_KEY")
-        return {address: (None, None) for address in addresses}
 
+def geocode_addresses(addresses):
     addresses_list = list(set(addresses))
     logger.info(f"Геокодирование {len(addresses_list)} адресов")
 
-    existing_places = Place.objects.filter(address__in=addresses_list)
-    existing_coords = {
-        place.address: (place.latitude, place.longitude) for place in existing_places
-    }
-    addresses_to_geocode = [
-        addr
+    existing_places = get_places(addresses_list)
+    now = timezone.now()
+    addresses_by_key = {}
+    for addr in addresses_list:
+        key = normalize_address(addr)
+        if key and (addr not in existing_places or existing_places[addr].is_retry_due(now)):
+            addresses_by_key.setdefault(key, addr)
+    results = {
+        addr: (existing_places[addr].latitude, existing_places[addr].longitude)
+        if addr in existing_places else (None, None)
         for addr in addresses_list
-        if addr not in existing_coords or not all(existing_coords[addr])
+    }
+    if not addresses_by_key:
+        return results
+
+    fetched = geocode_many(list(addresses_by_key.values()))
+
+    now = timezone.now()
+    places = []
+    for address, result in fetched.items():
+        previous = existing_places.get(address)
+        attempts = 0 if result.status == Place.OK else (previous.attempts if previous else 0) + 1
+        places.append(
+            Place(
+                address=address,
+                normalized_address=normalize_address(address),
+                latitude=result.lat,
+                longitude=result.lon,
+                status=result.status,
+                attempts=attempts,
+                last_updated=now,
+            )
+        )
+    release_stale_addresses(places)
+    Place.objects.bulk_create(
+        places,
+        update_conflicts=True,
+        unique_fields=["normalized_address"],
+        update_fields=["latitude", "longitude", "status", "attempts", "last_updated"],
+    )
+    fetched_by_key = {place.normalized_address: place for place in places}
+    for addr in addresses_list:
+        place = fetched_by_key.get(normalize_address(addr))
+        if place:
+            results[addr] = (place.latitude, place.longitude)
+    geocoded_addresses = [place.address for place in places if place.status == Place.OK]
+    if geocoded_addresses:
+        places_geocoded.send(sender=Place, addresses=geocoded_addresses)
+    return results
+
+
+def release_stale_addresses(places):
+    """Готовит к bulk_create места, чей адрес уже записан под другим ключом.
+
+    Так бывает, если правила нормализации поменялись после записи места.
+    Конфликт bulk_create ловит только по normalized_address, поэтому старой
+    записи с тем же address присваивается новый ключ, а если ключ уже занят
+    другим местом — старая запись удаляется.
+    """
+    keys = {place.address: place.normalized_address for place in places}
+    stale_places = list(
+        Place.objects.filter(address__in=keys).exclude(normalized_address__in=keys.values())
+    )
+    if not stale_places:
+        return
+    taken_keys = set(
+        Place.objects.filter(normalized_address__in=keys.values())
+        .values_list("normalized_address", flat=True)
+    )
+    renamed = []
+    removed = []
+    for place in stale_places:
+        key = keys[place.address]
+        if key in taken_keys:
+            removed.append(place.pk)
+        else:
+            place.normalized_address = key
+            taken_keys.add(key)
+            renamed.append(place)
+    Place.objects.filter(pk__in=removed).delete()
+    Place.objects.bulk_update(renamed, ["normalized_address"])
+
+
+def enqueue_geocoding(addresses):
+    addresses_by_key = {}
+    for address in addresses:
+        key = normalize_address(address) if address else ""
+        if key:
+            addresses_by_key.setdefault(key, address)
+    GeocodingJob.objects.bulk_create(
+        [GeocodingJob(address=address) for address in addresses_by_key.values()],
+        ignore_conflicts=True,
+    )
+
+
+def rescan_geocoding():
+    """Ставит в очередь адреса без координат, о которых сообщили приёмники geocoding_rescan.
+
+    Подстраховка к постановке в очередь при создании заказов и ресторанов:
+    так находятся адреса, чья задача была снята с очереди или не создалась.
+    """
+    addresses = set()
+    for _, found in geocoding_rescan.send(sender=Place):
+        addresses.update(found)
+    places = get_places(addresses)
+    missing = [
+        address for address in addresses
+        if address not in places or places[address].is_retry_due()
     ]
-    results = {addr: existing_coords.get(addr, (None, None)) for addr in addresses_list}
-
-    for address in addresses_to_geocode:
-        logger.info(f"Геокодирование адреса: {address}")
-        base_url = "https://geocode-maps.yandex.ru/1.x/"
-        params = {
-            "apikey": settings.YANDEX_GEOCODER_API_KEY,
-            "geocode": address,
-            "format": "json",
-        }
-        try:
-            response = requests.get(base_url, params=params, timeout=5)
-            if response.status_code in (403, 429):
-                logger.error(f"Ошибка {response.status_code} для {address}")
-                results[address] = (None, None)
-                continue
-            response.raise_for_status()
-            payload = response.json()
-            found_places = payload.get("response", {}).get(
-                "GeoObjectCollection", {}
-            ).get("featureMember")
-            if not found_places:
-                logger.info(f"Адрес {address} не найден")
-                results[address] = (None, None)
-                continue
-            feature = found_places[0].get("GeoObject", {})
-            kind = feature.get("metaDataProperty", {}).get(
-                "GeocoderMetaData", {}
-            ).get("kind", "")
-            precision = feature.get("metaDataProperty", {}).get(
-                "GeocoderMetaData", {}
-            ).get("precision", "")
-            address_text = feature.get("metaDataProperty", {}).get(
-                "GeocoderMetaData", {}
-            ).get("text", "")
-            point = feature.get("Point", {}).get("pos", "")
-            if point and kind in VALID_ADDRESS_KINDS and address.lower() in address_text.lower():
-                lon, lat = map(float, point.split())
-                if precision != "exact" and kind == "locality":
-                    logger.info(
-                        f"Адрес {address} определён как город, используются примерные координаты"
-                    )
-                logger.debug(
-                    f"Успешное геокодирование: {address}, kind: {kind}, "
-                    f"precision: {precision}, coords: ({lat}, {lon})"
-                )
-                results[address] = (lat, lon)
-                Place.objects.update_or_create(
-                    address=address,
-                    defaults={
-                        "latitude": lat,
-                        "longitude": lon,
-                        "last_updated": timezone.now(),
-                    },
-                )
-            else:
-                logger.info(
-                    f"Адрес {address} невалиден (kind: {kind}, text: {address_text})"
-                )
-                results[address] = (None, None)
-            time.sleep(0.1)
-        except requests.RequestException as e:
-            logger.error(f"Ошибка запроса для {address}: {str(e)}")
-            results[address] = (None, None)
-        except (KeyError, ValueError) as e:
-            logger.error(f"Ошибка обработки для {address}: {str(e)}")
-            results[address] = (None, None)
-
-    return results
\ No newline at end of file
+    enqueue_geocoding(missing)
+    return len(missing)
+
+
+def try_geocoding(addresses):
+    try:
+        geocode_addresses(addresses)
+    except Exception:
+        logger.exception(f"Ошибка геокодирования адресов: {addresses}")
+        return False
+    return True
+
+
+def postpone_jobs(jobs):
+    """Откладывает задачи с экспоненциальной паузой, после GEOCODING_JOB_MAX_ATTEMPTS удаляет."""
+    now = timezone.now()
+    postponed = []
+    dropped = []
+    for job in jobs:
+        job.attempts += 1
+        if job.attempts >= settings.GEOCODING_JOB_MAX_ATTEMPTS:
+            logger.error(f"Адрес {job.address} снят с очереди после {job.attempts} неудачных попыток")
+            dropped.append(job.pk)
+            continue
+        job.retry_at = now + timedelta(
+            seconds=settings.GEOCODING_JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        )
+        postponed.append(job)
+    GeocodingJob.objects.filter(pk__in=dropped).delete()
+    GeocodingJob.objects.bulk_update(postponed, ["attempts", "retry_at"])
+
+
+def process_geocoding_jobs(batch_size):
+    """Геокодирует пачку задач из очереди. Возвращает, сколько задач взято.
+
+    Если пачка падает с ошибкой, адреса пробуются по одному, и откладываются
+    только те, что упали снова, — один плохой адрес не держит остальные.
+    """
+    jobs = list(
+        GeocodingJob.objects.filter(Q(retry_at__isnull=True) | Q(retry_at__lte=timezone.now()))
+        [:batch_size]
+    )
+    if not jobs:
+        return 0
+    failed = []
+    if not try_geocoding([job.address for job in jobs]):
+        failed = jobs if len(jobs) == 1 else [
+            job for job in jobs if not try_geocoding([job.address])
+        ]
+    GeocodingJob.objects.filter(pk__in=[job.pk for job in jobs if job not in failed]).delete()
+    postpone_jobs(failed)
+    return len(jobs)
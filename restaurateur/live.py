@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateformat import format as format_date
+
+from foodcartapp.models import Order, OrderChange
+
+logger = logging.getLogger(__name__)
+
+
+def get_last_change_id():
+    return OrderChange.objects.settled().aggregate(last_id=Max("id"))["last_id"] or 0
+
+
+def format_datetime(value):
+    return format_date(timezone.localtime(value), "Y-m-d H:i") if value else None
+
+
+def serialize_order_delta(order):
+    return {
+        "id": order.id,
+        "firstname": order.firstname,
+        "lastname": order.lastname,
+        "phonenumber": str(order.phonenumber),
+        "address": order.address,
+        "products": ", ".join(
+            f"{item.product.name} ({item.quantity} шт., {item.price:.2f} ₽)"
+            for item in order.items.all()
+        ),
+        "total_price": f"{order.total_price:.2f}",
+        "status": order.status,
+        "status_display": order.get_status_display(),
+        "comment": order.comment,
+        "created_at": format_datetime(order.created_at),
+        "called_at": format_datetime(order.called_at),
+        "delivered_at": format_datetime(order.delivered_at),
+        "payment_method": order.payment_method,
+        "payment_method_display": order.get_payment_method_display(),
+        "restaurant_id": order.restaurant_id,
+        "restaurant": order.restaurant.name if order.restaurant else None,
+    }
+
+
+def fetch_order_events(after_id, limit):
+    """Собирает дельты заказов по журналу изменений после after_id.
+
+    Несколько изменений одного заказа схлопываются в одно событие
+    с номером последнего изменения.
+    """
+    last_changes, last_id, _ = OrderChange.objects.collapse_after(after_id, limit)
+    orders = (
+        Order.objects.select_related("restaurant")
+        .prefetch_related("items__product")
+        .in_bulk(
+            [order_id for order_id, (_, kind) in last_changes.items() if kind != OrderChange.DELETED]
+        )
+    )
+    events = []
+    for order_id, (change_id, kind) in last_changes.items():
+        order = orders.get(order_id)
+        if order is None:
+            delta = {"id": order_id, "kind": OrderChange.DELETED}
+        else:
+            delta = {**serialize_order_delta(order), "kind": kind}
+        events.append((change_id, delta))
+    events.sort(key=lambda event: event[0])
+    return events, last_id
+
+
+class OrderChangeFeed:
+    """Общая на процесс лента изменений заказов.
+
+    Журнал опрашивает одна задача, а все открытые SSE-соединения менеджеров
+    ждут новые события из её буфера, не обращаясь к базе.
+    """
+
+    def __init__(self, poll_interval, buffer_size):
+        self.poll_interval = poll_interval
+        self.events = deque(maxlen=buffer_size)
+        self.floor_id = 0
+        self.last_id = 0
+        self._loop = None
+        self._condition = None
+        self._ready = None
+        self._task = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task.done():
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self._ready = asyncio.Event()
+            self._task = loop.create_task(self._poll())
+
+    async def _poll(self):
+        while not self._ready.is_set():
+            try:
+                last_id = await sync_to_async(get_last_change_id)()
+            except Exception:
+                logger.exception("Не удалось прочитать журнал изменений заказов")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            self.events.clear()
+            self.last_id = self.floor_id = last_id
+            self._ready.set()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                events, last_id = await sync_to_async(fetch_order_events)(
+                    self.last_id, self.events.maxlen
+                )
+            except Exception:
+                logger.exception("Не удалось прочитать журнал изменений заказов")
+                continue
+            if last_id == self.last_id:
+                continue
+            overflow = len(self.events) + len(events) - self.events.maxlen
+            if overflow > 0:
+                self.floor_id = [*self.events, *events][overflow - 1][0]
+            self.events.extend(events)
+            self.last_id = last_id
+            async with self._condition:
+                self._condition.notify_all()
+
+    async def wait(self, after_id, timeout):
+        """Возвращает события новее after_id или None, если клиент отстал от буфера."""
+        self.start()
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if after_id < self.floor_id:
+            return None
+        after_id = min(after_id, self.last_id)
+        try:
+            async with self._condition:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.last_id > after_id), timeout
+                )
+        except asyncio.TimeoutError:
+            return []
+        if after_id < self.floor_id:
+            return None
+        return [event for event in self.events if event[0] > after_id]
+
+
+order_change_feed = OrderChangeFeed(
+    settings.ORDER_EVENTS_POLL_INTERVAL, settings.ORDER_EVENTS_BUFFER_SIZE
+)
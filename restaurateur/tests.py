@@ -1,3 +1,169 @@
-from django.test import TestCase
+import copy
+import csv
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.handlers import base
+from django.core.handlers.asgi import ASGIHandler
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from foodcartapp.models import Order, OrderItem, Restaurant
+from foodcartapp.synthetic import create_manager, generate_dataset
+from foodcartapp.versions import MENU_VERSION_KEY, bump_version
+from star_burger.db_router import PRIMARY_PIN_COOKIE, replica_health
+
+REPLICA = "replica_test"
+
+
+def add_replica_database():
+    """Вторая база для тестов: отдельная in-memory SQLite или test_<имя>_replica."""
+    settings_dict = copy.deepcopy(connections[DEFAULT_DB_ALIAS].settings_dict)
+    test_name = None
+    if connections[DEFAULT_DB_ALIAS].vendor != "sqlite":
+        test_name = f"test_{settings_dict['NAME']}_replica"
+    # Старые миграции с RunPython не умеют работать с несколькими базами.
+    settings_dict["TEST"].update({"NAME": test_name, "MIRROR": None, "MIGRATE": False})
+    connections.settings[REPLICA] = settings_dict
+    old_name = settings_dict["NAME"]
+    connections[REPLICA].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return old_name
+
+
+def remove_replica_database(old_name):
+    connections[REPLICA].creation.destroy_test_db(old_name, verbosity=0)
+    del connections[REPLICA]
+    del connections.settings[REPLICA]
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TestCase):
+    """Маршрутизация чтения на двух отдельных базах: основной и реплике."""
+
+    # Реплика заводится на время класса, а не в settings, и в databases попадает
+    # только в setUpClass: раннер проверяет базы из databases ещё до запуска тестов.
+    @classmethod
+    def setUpClass(cls):
+        cls.addClassCleanup(remove_replica_database, add_replica_database())
+        cls.databases = {DEFAULT_DB_ALIAS, REPLICA}
+        cls.addClassCleanup(delattr, cls, "databases")
+        super().setUpClass()
+
+    def setUp(self):
+        replica_health.reset()
+        self.restaurant = Restaurant.objects.create(name="Основная база")
+        Restaurant.objects.using(REPLICA).create(id=self.restaurant.id, name="Реплика")
+        self.client.force_login(create_manager())
+
+    def test_read_only_view_reads_replica(self):
+        response = self.client.get("/manager/restaurants/")
+        self.assertContains(response, "Реплика")
+        self.assertNotContains(response, "Основная база")
+
+    def test_process_caches_are_built_from_primary(self):
+        restaurant = Restaurant.objects.create(name="Новый ресторан")
+        bump_version(MENU_VERSION_KEY)
+        response = self.client.get("/manager/products/")
+        self.assertIn("Новый ресторан", [item.name for item in response.context["restaurants"]])
+
+        # Реплика догнала основную базу, версия меню прежняя — матрица та же.
+        Restaurant.objects.using(REPLICA).create(id=restaurant.id, name="Новый ресторан")
+        response = self.client.get("/manager/products/")
+        self.assertIn("Новый ресторан", [item.name for item in response.context["restaurants"]])
+        self.assertNotIn("Реплика", [item.name for item in response.context["restaurants"]])
+
+    def test_admin_change_pins_primary(self):
+        response = self.client.post(
+            f"/admin/foodcartapp/restaurant/{self.restaurant.id}/change/?next=/manager/restaurants/",
+            {
+                "name": "Переименован",
+                "address": "",
+                "contact_phone": "",
+                "menu_items-TOTAL_FORMS": "0",
+                "menu_items-INITIAL_FORMS": "0",
+            },
+            follow=True,
+        )
+        self.assertContains(response, "Переименован")
+        self.assertIn(PRIMARY_PIN_COOKIE, self.client.cookies)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        failures = {
+            "lag": mock.Mock(return_value=60.0),
+            "unavailable": mock.Mock(side_effect=OperationalError),
+        }
+        for name, get_replication_lag in failures.items():
+            with self.subTest(name), mock.patch(
+                "star_burger.db_router.get_replication_lag", get_replication_lag
+            ):
+                replica_health.reset()
+                response = self.client.get("/manager/restaurants/")
+                self.assertContains(response, "Основная база")
+
+
+class OrderExportTest(TestCase):
+    def setUp(self):
+        dataset = generate_dataset(restaurants=2, products=5, orders=30)
+        self.restaurant = dataset["restaurants"][0]
+        Order.objects.filter(id__in=[order.id for order in dataset["orders"][::3]]).update(
+            restaurant=self.restaurant
+        )
+        self.client.force_login(create_manager())
+
+    def export(self, export_format, query=""):
+        response = self.client.get(f"/manager/orders/export/?format={export_format}&{query}")
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def page_order_ids(self, query):
+        response = self.client.get(f"/manager/orders/?{query}")
+        return sorted(order.id for order in response.context["order_items"])
+
+    def test_filters_select_the_same_orders_as_orders_page(self):
+        queries = ["", "payment_method=CASH", f"restaurant={self.restaurant.id}"] + [
+            f"status={status}" for status, _ in Order.STATUS_CHOICES[:-1]
+        ] + [
+            f"status=NEW&restaurant={self.restaurant.id}",
+            "status=COOKING&restaurant=none&payment_method=ONLINE",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                exported = [json.loads(line) for line in self.export("jsonl", query).splitlines()]
+                self.assertEqual([order["id"] for order in exported], self.page_order_ids(query))
+
+    def test_rows_match_orders_and_items(self):
+        exported = [json.loads(line) for line in self.export("jsonl").splitlines()]
+        orders = Order.objects.exclude(status="COMPLETED")
+        self.assertEqual(len(exported), orders.count())
+        for row in exported:
+            order = Order.objects.get(id=row["id"])
+            self.assertEqual(row["status"], order.status)
+            self.assertEqual(row["restaurant_id"], order.restaurant_id)
+            self.assertEqual(row["total_price"], f"{order.total_price:.2f}")
+            self.assertEqual(
+                [(item["product_id"], item["quantity"]) for item in row["items"]],
+                list(order.items.values_list("product_id", "quantity")),
+            )
+
+        rows = list(csv.DictReader(io.StringIO(self.export("csv"))))
+        items = OrderItem.objects.filter(order__in=orders)
+        self.assertEqual(len(rows), items.count())
+        self.assertEqual(
+            {(int(row["id"]), int(row["product_id"]), int(row["quantity"])) for row in rows},
+            set(items.values_list("order_id", "product_id", "quantity")),
+        )
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get("/manager/orders/export/?format=csv&date_from=вчера")
+        self.assertEqual(response.status_code, 400)
+
+
+class AsgiMiddlewareTest(SimpleTestCase):
+    @override_settings(DEBUG=True)
+    def test_async_views_are_not_adapted_to_sync_middleware(self):
+        # С DEBUG обработчик пишет в лог каждую обёртку sync_to_async между middleware.
+        with mock.patch.object(base.logger, "debug") as debug:
+            ASGIHandler()
+        adapted = [call.args[1] for call in debug.call_args_list if "adapted" in call.args[0]]
+        self.assertEqual(adapted, [])
@@ -14,6 +14,8 @@ urlpatterns = [
 
 
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/events/', views.order_events, name="order_events"),
+    path('orders/export/', views.export_orders, name="export_orders"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
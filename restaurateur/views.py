@@ -1,14 +1,36 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS, router
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views import View
+from foodcartapp.availability import get_availability_matrix
+from foodcartapp.eligibility import attach_available_restaurants
+from foodcartapp.exports import (
+    EXPORT_FORMATS,
+    get_export_orders,
+    iter_export_orders,
+    parse_export_filters,
+    render_export,
+)
+from foodcartapp.locations import get_restaurant_locator
 from foodcartapp.models import Product, Restaurant, Order
-from geopy.distance import geodesic
-from places.models import Place
-from places.utils import geocode_addresses
+from places.distances import refine_nearest
+from places.utils import get_places
+from star_burger.db_router import read_from_replica
+
+from .live import get_last_change_id, order_change_feed
 
 
 class Login(forms.Form):
@@ -58,81 +80,135 @@ def is_manager(user):
 
 
 @user_passes_test(is_manager, login_url="restaurateur:login")
+@read_from_replica
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by("name"))
-    products = list(Product.objects.prefetch_related("menu_items"))
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {
-            item.restaurant_id: item.availability for item in product.menu_items.all()
-        }
-        ordered_availability = [
-            availability.get(restaurant.id, False) for restaurant in restaurants
-        ]
-        products_with_restaurant_availability.append((product, ordered_availability))
+    matrix = get_availability_matrix()
+    columns = settings.MANAGER_PRODUCTS_RESTAURANTS_PER_PAGE
+    start = request.GET.get("restaurants_from", "")
+    start = int(start) if start.isdigit() and int(start) < len(matrix.restaurants) else 0
+    stop = min(start + columns, len(matrix.restaurants))
+
+    products = Product.objects.select_related("category").order_by("id")
+    after = request.GET.get("after", "")
+    if after.isdigit():
+        products = products.filter(id__gt=after)
+    page_size = settings.MANAGER_PRODUCTS_PAGE_SIZE
+    products = list(products[:page_size + 1])
+    next_url = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        query = request.GET.copy()
+        query["after"] = products[-1].id
+        next_url = f"?{query.urlencode()}"
+
+    restaurants_urls = {}
+    positions = {"previous": max(start - columns, 0) if start else None, "next": stop}
+    for name, position in positions.items():
+        if position is not None and position < len(matrix.restaurants):
+            query = request.GET.copy()
+            query["restaurants_from"] = position
+            restaurants_urls[name] = f"?{query.urlencode()}"
+
+    products_with_restaurant_availability = [
+        (product, matrix.get_cells(product.id, start, stop)) for product in products
+    ]
     return render(
         request,
         "products_list.html",
         context={
             "products_with_restaurant_availability": products_with_restaurant_availability,
-            "restaurants": restaurants,
+            "restaurants": matrix.restaurants[start:stop],
+            "next_url": next_url,
+            "previous_restaurants_url": restaurants_urls.get("previous"),
+            "next_restaurants_url": restaurants_urls.get("next"),
         },
     )
 
 
 @user_passes_test(is_manager, login_url="restaurateur:login")
+@read_from_replica
 def view_restaurants(request):
     return render(
         request, "restaurants_list.html", context={"restaurants": Restaurant.objects.all()}
     )
 
 
+def format_distance(distance):
+    if distance is None:
+        return None, "Адрес не найден"
+    if distance > 100:
+        return round(distance / 1000, 1), "км"
+    return round(distance), "м"
+
+
 @user_passes_test(is_manager, login_url="restaurateur:login")
+@read_from_replica
 def view_orders(request):
-    orders = (
-        Order.objects.with_total_price()
-        .exclude(status="COMPLETED")
-        .order_by("-id")
+    filters = {
+        "status": request.GET.get("status", ""),
+        "restaurant": request.GET.get("restaurant", ""),
+        "payment_method": request.GET.get("payment_method", ""),
+    }
+    orders = Order.objects.filter_for_manager(**filters)
+    after = request.GET.get("after", "")
+    if after.isdigit():
+        orders = orders.filter(id__lt=after)
+
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    orders = list(
+        orders.order_by("-id")
         .select_related("restaurant")
-        .prefetch_related("items__product")
-        .with_available_restaurants()
+        .prefetch_related("items__product")[:page_size + 1]
     )
-    addresses = list(orders.values_list("address", flat=True).distinct())
-    addresses.extend(Restaurant.objects.values_list("address", flat=True).distinct())
-    places = Place.objects.filter(address__in=addresses)
-    place_coords = {place.address: (place.latitude, place.longitude) for place in places}
-    coords = geocode_addresses(addresses)
+    next_url = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        query = request.GET.copy()
+        query["after"] = orders[-1].id
+        next_url = f"?{query.urlencode()}"
+    last_change_id = get_last_change_id()
+    attach_available_restaurants(orders)
+    locator = get_restaurant_locator()
+    places = get_places({order.address for order in orders})
+    place_coords = {
+        address: (place.latitude, place.longitude) for address, place in places.items()
+    }
 
+    nearest_count = settings.MANAGER_NEAREST_RESTAURANTS
     for order in orders:
-        order_coords = place_coords.get(order.address, coords.get(order.address))
-        available_restaurants = getattr(order, "available_restaurants", [])
+        order_coords = place_coords.get(order.address)
+        available_restaurants = order.available_restaurants
+        nearest = []
+        if order_coords and None not in order_coords:
+            nearest = locator.nearest(
+                order_coords,
+                k=nearest_count,
+                restaurant_ids=[restaurant.id for restaurant in available_restaurants],
+            )
+            refined_distances = refine_nearest(
+                order_coords,
+                [locator.coords[restaurant.id] for restaurant, _ in nearest],
+                [distance for _, distance in nearest],
+                settings.GEODESIC_REFINE_TOP_K,
+            )
+            nearest = [
+                (restaurant, distance)
+                for (restaurant, _), distance in zip(nearest, refined_distances.tolist())
+            ]
+        located_ids = {restaurant.id for restaurant, _ in nearest}
+        unlocated = [
+            restaurant for restaurant in available_restaurants
+            if restaurant.id not in located_ids
+        ]
+        nearest.extend(
+            (restaurant, None) for restaurant in unlocated[:nearest_count - len(nearest)]
+        )
+
         restaurants_with_distances = []
-        for restaurant in available_restaurants:
+        for restaurant, distance in nearest:
             if order.address == restaurant.address:
                 distance = 0
-                display_distance = 0
-                distance_unit = "м"
-            else:
-                rest_coords = place_coords.get(
-                    restaurant.address, coords.get(restaurant.address)
-                )
-                if not order_coords or not rest_coords or None in order_coords or None in rest_coords:
-                    distance = None
-                    display_distance = None
-                    distance_unit = "Адрес не найден"
-                else:
-                    try:
-                        distance = geodesic(order_coords, rest_coords).meters
-                        if distance > 100:
-                            display_distance = round(distance / 1000, 1)
-                            distance_unit = "км"
-                        else:
-                            display_distance = round(distance)
-                            distance_unit = "м"
-                    except ValueError:
-                        distance = None
-                        display_distance = None
-                        distance_unit = "Адрес не найден"
+            display_distance, distance_unit = format_distance(distance)
             restaurants_with_distances.append(
                 {
                     "restaurant": restaurant,
@@ -144,8 +220,87 @@ def view_orders(request):
         restaurants_with_distances.sort(
             key=lambda r: r["distance"] if r["distance"] is not None else float("inf")
         )
+        # Показываются только nearest_count ближайших, об остальных менеджер видит число.
+        setattr(order, "more_restaurants_count", len(available_restaurants) - len(nearest))
         setattr(order, "available_restaurants", restaurants_with_distances)
 
     return render(
-        request, "order_items.html", context={"order_items": orders}
-    )
\ No newline at end of file
+        request,
+        "order_items.html",
+        context={
+            "order_items": orders,
+            "filters": filters,
+            "next_url": next_url,
+            "status_choices": Order.STATUS_CHOICES,
+            "payment_method_choices": Order.PAYMENT_METHOD_CHOICES,
+            "filter_restaurants": Restaurant.objects.order_by("name"),
+            "last_change_id": last_change_id,
+        },
+    )
+
+
+async def stream_order_events(after_id):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.ORDER_EVENTS_STREAM_TIMEOUT
+    yield "retry: 3000\n\n"
+    while loop.time() < deadline:
+        events = await order_change_feed.wait(after_id, settings.ORDER_EVENTS_HEARTBEAT)
+        if events is None:
+            yield "event: reset\ndata: {}\n\n"
+            return
+        if not events:
+            yield ": ping\n\n"
+            continue
+        for change_id, delta in events:
+            yield f"id: {change_id}\nevent: order\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n"
+        after_id = events[-1][0]
+
+
+@user_passes_test(is_manager, login_url="restaurateur:login")
+async def order_events(request):
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI бесконечный поток занял бы воркер целиком: 204 велит
+        # EventSource не переподключаться, страница работает без живых обновлений.
+        return HttpResponse(status=204)
+    cursor = request.headers.get("Last-Event-ID") or request.GET.get("since", "")
+    after_id = int(cursor) if cursor.isdigit() else order_change_feed.last_id
+    return StreamingHttpResponse(
+        stream_order_events(after_id),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def iterate_in_thread(iterator):
+    # Синхронный итератор StreamingHttpResponse под ASGI сначала читает целиком,
+    # поэтому пачки забираются по одной в том же потоке, где открыто соединение с базой.
+    next_batch = sync_to_async(next)
+    while (batch := await next_batch(iterator, None)) is not None:
+        yield batch
+
+
+@user_passes_test(is_manager, login_url="restaurateur:login")
+@read_from_replica
+def export_orders(request):
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"format: ожидается одно из {', '.join(EXPORT_FORMATS)}")
+    try:
+        filters = parse_export_filters(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+    # Выгрузка читается уже после выхода из view, поэтому база выбирается здесь.
+    database = router.db_for_read(Order) or DEFAULT_DB_ALIAS
+    orders = get_export_orders(filters).using(database)
+    content = render_export(
+        iter_export_orders(orders, settings.ORDER_EXPORT_CHUNK_SIZE), export_format
+    )
+    if isinstance(request, ASGIRequest):
+        content = iterate_in_thread(content)
+    filename = f"orders-{timezone.localdate():%Y%m%d}.{export_format}"
+    return StreamingHttpResponse(
+        content,
+        content_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
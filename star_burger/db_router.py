@@ -0,0 +1,198 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_PIN_COOKIE = "primary_pin"
+
+POSTGRESQL_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_request_routing = ContextVar("request_routing", default=None)
+
+
+class RequestRouting:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+@contextmanager
+def replica_reads():
+    """Разрешает читать с реплик внутри блока."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Читает с основной базы внутри блока, даже если вокруг replica_reads().
+
+    Нужен для кэшей на процесс: собранные с отставшей реплики, они остались
+    бы старыми до следующей смены версии.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """Декоратор для view, которые только читают данные."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def get_replication_lag(connection):
+    """Отставание реплики в секундах."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(POSTGRESQL_LAG_SQL)
+        else:
+            cursor.execute("SELECT 0")
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+class ReplicaHealth:
+    """Кэширует на процесс доступность реплик и их отставание."""
+
+    def __init__(self):
+        self._states = {}
+
+    def reset(self):
+        self._states.clear()
+
+    def get_available(self):
+        return [alias for alias in settings.DATABASE_REPLICAS if self.is_available(alias)]
+
+    def is_available(self, alias):
+        now = time.monotonic()
+        state = self._states.get(alias)
+        if state is None or now - state[0] >= settings.DATABASE_REPLICA_CHECK_INTERVAL:
+            state = (now, self.check(alias))
+            self._states[alias] = state
+        return state[1]
+
+    def check(self, alias):
+        try:
+            lag = get_replication_lag(connections[alias])
+        except DatabaseError:
+            logger.warning(f"Реплика {alias} недоступна, чтение идёт с основной базы")
+            connections[alias].close()
+            return False
+        if lag > settings.DATABASE_REPLICA_MAX_LAG:
+            logger.warning(f"Реплика {alias} отстаёт на {lag:.1f} с, чтение идёт с основной базы")
+            return False
+        return True
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    """Отправляет чтение на реплики, запись и всё остальное — на основную базу.
+
+    С реплик читается только внутри replica_reads(). После записи
+    запрос до конца читает с основной базы, а браузер ещё
+    DATABASE_REPLICA_PIN_SECONDS — см. PrimaryPinMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not _replica_reads.get():
+            return None
+        if model._meta.app_label == "django_cache":
+            # Версии в DatabaseCache читаются с основной базы, иначе отставшая
+            # реплика вернула бы старую версию уже после её смены.
+            return None
+        routing = _request_routing.get()
+        if routing is not None and (routing.pinned or routing.wrote):
+            return None
+        available = replica_health.get_available()
+        if not available:
+            return None
+        return random.choice(available)
+
+    def db_for_write(self, model, **hints):
+        routing = _request_routing.get()
+        if routing is not None and model._meta.app_label != "django_cache":
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет за браузером основную базу после запросов с записью.
+
+    Так после сохранения в админке редирект из response_change и следующие
+    страницы видят изменения, даже если реплика ещё не догнала основную базу.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = RequestRouting(pinned=PRIMARY_PIN_COOKIE in request.COOKIES)
+        token = _request_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_routing.reset(token)
+        return self.pin_primary(request, response, routing)
+
+    async def __acall__(self, request):
+        # sync_to_async копирует контекст в поток view, поэтому запись,
+        # сделанная там, видна здесь через общий объект routing.
+        routing = RequestRouting(pinned=PRIMARY_PIN_COOKIE in request.COOKIES)
+        token = _request_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_routing.reset(token)
+        return self.pin_primary(request, response, routing)
+
+    def pin_primary(self, request, response, routing):
+        if settings.DATABASE_REPLICAS and (
+            routing.wrote or request.method not in ("GET", "HEAD", "OPTIONS")
+        ):
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
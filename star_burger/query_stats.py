@@ -0,0 +1,102 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    def __init__(self):
+        self.statements = Counter()
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started_at
+            self.statements[sql] += 1
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    @property
+    def duration_ms(self):
+        return round(self.duration * 1000, 2)
+
+
+@contextmanager
+def count_queries(using=None):
+    """Считает SQL-запросы, повторы и время в БД внутри блока по всем или одному подключению."""
+    stats = QueryStats()
+    aliases = [using] if using else list(connections)
+    with _wrap_connections(aliases, stats):
+        yield stats
+
+
+@contextmanager
+def _wrap_connections(aliases, stats):
+    if not aliases:
+        yield
+        return
+    with connections[aliases[0]].execute_wrapper(stats):
+        with _wrap_connections(aliases[1:], stats):
+            yield
+
+
+class QueryStatsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.QUERY_STATS_ENABLED:
+            return self.get_response(request)
+
+        with count_queries() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_STATS_ENABLED:
+            return await self.get_response(request)
+
+        with count_queries() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        response["Server-Timing"] = (
+            f'db;dur={stats.duration_ms};desc="{stats.count} queries, '
+            f'{stats.duplicates} duplicates"'
+        )
+        resolver_match = request.resolver_match
+        logger.info(json.dumps({
+            "event": "query_stats",
+            "method": request.method,
+            "path": request.path,
+            "view": resolver_match.view_name if resolver_match else None,
+            "status": response.status_code,
+            "queries": stats.count,
+            "duplicate_queries": stats.duplicates,
+            "db_time_ms": stats.duration_ms,
+        }, ensure_ascii=False))
+        return response
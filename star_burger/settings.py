@@ -12,8 +12,22 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 YANDEX_GEOCODER_API_KEY = config('YANDEX_GEOCODER_API_KEY', default='')
+ADDRESS_CITIES = env.list('ADDRESS_CITIES', ['москва'])
+GEOCODER_BACKENDS = env.list('GEOCODER_BACKENDS', ['places.geocoders.YandexGeocoder'])
+GEOCODER_GAZETTEER_PATH = env('GEOCODER_GAZETTEER_PATH', '')
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x/')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_CONCURRENCY = env.int('GEOCODER_CONCURRENCY', 8)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 10)
+GEOCODER_RETRY_BACKOFF = env.int('GEOCODER_RETRY_BACKOFF', 60 * 60)
+GEOCODER_RETRY_BACKOFF_MAX = env.int('GEOCODER_RETRY_BACKOFF_MAX', 60 * 60 * 24 * 7)
+GEOCODING_JOB_RETRY_BACKOFF = env.int('GEOCODING_JOB_RETRY_BACKOFF', 60)
+GEOCODING_JOB_MAX_ATTEMPTS = env.int('GEOCODING_JOB_MAX_ATTEMPTS', 8)
+GEODESIC_REFINE_TOP_K = env.int('GEODESIC_REFINE_TOP_K', 0)
+RESTAURANT_GRID_CELL_KM = env.float('RESTAURANT_GRID_CELL_KM', 2)
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
+QUERY_STATS_ENABLED = env.bool('QUERY_STATS_ENABLED', DEBUG)
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
@@ -34,6 +48,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'star_burger.staticfiles.PrecompressedStaticMiddleware',
+    'star_burger.query_stats.QueryStatsMiddleware',
+    'star_burger.db_router.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,6 +97,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'star_burger.wsgi.application'
+ASGI_APPLICATION = 'star_burger.asgi.application'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
@@ -90,6 +108,32 @@ DATABASES = {
     )
 }
 
+# Версии каталога, меню и адресов лежат в кэше и должны быть общими для всех
+# процессов: воркеров gunicorn, geocoding_worker и management-команд.
+CACHES = {
+    'default': {
+        'BACKEND': env(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.db.DatabaseCache',
+        ),
+        'LOCATION': env('CACHE_LOCATION', '' if DEBUG else 'django_cache'),
+    }
+}
+
+DATABASE_REPLICA_URLS = env.list('DATABASE_REPLICA_URLS', [])
+DATABASE_REPLICAS = []
+for number, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    alias = 'replica_{0}'.format(number)
+    DATABASES[alias] = dj_database_url.parse(url)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['star_burger.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICA_MAX_LAG = env.float('DATABASE_REPLICA_MAX_LAG', 5.0)
+DATABASE_REPLICA_CHECK_INTERVAL = env.float('DATABASE_REPLICA_CHECK_INTERVAL', 10.0)
+DATABASE_REPLICA_PIN_SECONDS = env.int('DATABASE_REPLICA_PIN_SECONDS', 10)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -119,6 +163,43 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "bundles"),
 ]
 
+STATIC_HASHED_FILES = env.bool('STATIC_HASHED_FILES', not DEBUG)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'star_burger.staticfiles.CompressedManifestStaticFilesStorage'
+            if STATIC_HASHED_FILES
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
+PRODUCT_IMAGE_SIZES = env.list('PRODUCT_IMAGE_SIZES', [64, 256, 800], subcast=int)
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24)
+ORDER_BATCH_MAX_SIZE = env.int('ORDER_BATCH_MAX_SIZE', 1000)
+ORDER_FAST_PATH_ENABLED = env.bool('ORDER_FAST_PATH_ENABLED', True)
+ORDER_GROUP_COMMIT_ENABLED = env.bool('ORDER_GROUP_COMMIT_ENABLED', False)
+ORDER_GROUP_COMMIT_BATCH_SIZE = env.int('ORDER_GROUP_COMMIT_BATCH_SIZE', 200)
+ORDER_GROUP_COMMIT_MAX_DELAY_MS = env.float('ORDER_GROUP_COMMIT_MAX_DELAY_MS', 5.0)
+ORDER_GROUP_COMMIT_TIMEOUT = env.float('ORDER_GROUP_COMMIT_TIMEOUT', 10.0)
+IDEMPOTENCY_KEY_TTL_HOURS = env.float('IDEMPOTENCY_KEY_TTL_HOURS', 24.0)
+IDEMPOTENCY_LEASE_SECONDS = env.float('IDEMPOTENCY_LEASE_SECONDS', 60.0)
+IDEMPOTENCY_CACHE_SIZE = env.int('IDEMPOTENCY_CACHE_SIZE', 10000)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+MANAGER_PRODUCTS_PAGE_SIZE = env.int('MANAGER_PRODUCTS_PAGE_SIZE', 50)
+MANAGER_PRODUCTS_RESTAURANTS_PER_PAGE = env.int('MANAGER_PRODUCTS_RESTAURANTS_PER_PAGE', 30)
+MANAGER_NEAREST_RESTAURANTS = env.int('MANAGER_NEAREST_RESTAURANTS', 5)
+ORDER_CHANGES_SETTLE_SECONDS = env.float('ORDER_CHANGES_SETTLE_SECONDS', 10.0)
+ORDER_CHANGES_PAGE_SIZE = env.int('ORDER_CHANGES_PAGE_SIZE', 500)
+ORDER_EXPORT_CHUNK_SIZE = env.int('ORDER_EXPORT_CHUNK_SIZE', 2000)
+ORDER_EVENTS_POLL_INTERVAL = env.float('ORDER_EVENTS_POLL_INTERVAL', 1.0)
+ORDER_EVENTS_HEARTBEAT = env.float('ORDER_EVENTS_HEARTBEAT', 15.0)
+ORDER_EVENTS_BUFFER_SIZE = env.int('ORDER_EVENTS_BUFFER_SIZE', 1000)
+ORDER_EVENTS_STREAM_TIMEOUT = env.float('ORDER_EVENTS_STREAM_TIMEOUT', 300.0)
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -0,0 +1,179 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+from urllib.parse import unquote
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".html", ".txt", ".xml", ".ico", ".wasm",
+}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# Кодировки в порядке предпочтения и расширения их сжатых копий.
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def compress(content):
+    """Сжатые копии файла {расширение: байты}, только если они заметно меньше исходника."""
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    return {
+        extension: compressed
+        for extension, compressed in variants.items()
+        if len(compressed) < len(content) * 0.95
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Добавляет к именам файлов хэш содержимого и кладёт рядом копии .gz и .br.
+
+    Шаблонный тег {% static %} с этим хранилищем отдаёт хэшированные имена,
+    так что в браузер уходят ссылки, которые можно кэшировать навсегда.
+    """
+
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            if len(content) < self.min_compress_size:
+                continue
+            for extension, compressed in compress(content).items():
+                with open(self.path(name + extension), "wb") as compressed_file:
+                    compressed_file.write(compressed)
+                yield name, name + extension, True
+
+
+def parse_accept_encoding(header):
+    """Кодировки, которые принимает клиент: q=0 означает запрет."""
+    accepted = set()
+    for part in header.split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = params.strip().partition("q=")[2]
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """Отдаёт файлы из STATIC_ROOT, выбирая сжатую копию по Accept-Encoding.
+
+    Хэшированные имена из манифеста кэшируются браузером навсегда,
+    остальные файлы браузер перепроверяет по Last-Modified. При DEBUG
+    статику отдаёт runserver, и middleware ничего не делает.
+
+    Работает и под ASGI без обёрток sync_to_async: файл ищется и открывается
+    прямо в цикле событий, но это stat и open локального файла, а найденные
+    файлы запоминаются.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.static_url = settings.STATIC_URL
+        if not self.static_url.startswith("/"):
+            self.static_url = "/" + self.static_url
+        self._files = {}
+        self._hashed_names = None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.match(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self.serve(request, *static_file)
+
+    async def __acall__(self, request):
+        static_file = self.match(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return self.serve(request, *static_file)
+
+    def match(self, request):
+        if (
+            settings.DEBUG
+            or not settings.STATIC_ROOT
+            or request.method not in ("GET", "HEAD")
+            or not request.path.startswith(self.static_url)
+        ):
+            return None
+        return self.find_file(request.path[len(self.static_url):])
+
+    def find_file(self, name):
+        name = posixpath.normpath(unquote(name)).lstrip("/")
+        static_file = self._files.get(name)
+        if static_file is not None:
+            return static_file
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        variants = {
+            encoding: path + extension
+            for encoding, extension in ENCODINGS
+            if os.path.isfile(path + extension)
+        }
+        if self._hashed_names is None:
+            self._hashed_names = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        static_file = (path, variants, name in self._hashed_names)
+        self._files[name] = static_file
+        return static_file
+
+    def serve(self, request, path, variants, immutable):
+        accepted = parse_accept_encoding(request.headers.get("Accept-Encoding", ""))
+        encoding = next(
+            (
+                encoding for encoding, _ in ENCODINGS
+                if encoding in variants and (encoding in accepted or "*" in accepted)
+            ),
+            None,
+        )
+        served_path = variants[encoding] if encoding else path
+        stat = os.stat(served_path)
+        if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = FileResponse(open(served_path, "rb"), content_type=content_type)
+            response.headers.pop("Content-Disposition", None)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        if variants:
+            response["Vary"] = "Accept-Encoding"
+        return response